@@ -0,0 +1,133 @@
+# analytics.py
+# Vectorized analysis helpers shared by calculations.py and analyze_visualize.py.
+# Columns are streamed out of SQLite in fixed-size chunks straight into
+# NumPy arrays (no per-row Python tuples kept around), artists are
+# dictionary-encoded to dense integer codes, and group-by means,
+# correlations and histograms are computed with array operations.
+
+from collections import namedtuple
+
+import numpy as np
+
+CHUNK_ROWS = 100000
+
+# One row per chart entry. Only indexed columns, so both tables are read
+# through covering indexes.
+CHART_ROWS_SQL = """
+    SELECT chart_popularity.track_id, chart_popularity.chart_position, tracks.artist_id
+    FROM chart_popularity
+    JOIN tracks ON tracks.id = chart_popularity.track_id;
+"""
+
+# One row per track that has lyrics.
+LYRIC_ROWS_SQL = """
+    SELECT lyrics.track_id, tracks.artist_id, lyrics.char_count, lyrics.word_count
+    FROM lyrics
+    JOIN tracks ON tracks.id = lyrics.track_id
+    WHERE lyrics.char_count IS NOT NULL;
+"""
+
+ChartData = namedtuple("ChartData", "track_id position artist_code")
+LyricData = namedtuple("LyricData", "track_id artist_code char_count word_count")
+
+
+def load_columns(conn, sql, params=(), dtype=np.float64, chunk_rows=CHUNK_ROWS):
+    """
+    Run a query and return one 1-D array per result column.
+    Rows are fetched chunk_rows at a time, so at most one chunk of Python
+    tuples is alive at once; everything else is packed numeric arrays.
+    NULLs become NaN.
+    """
+    cur = conn.execute(sql, params)
+    ncols = len(cur.description)
+    chunks = []
+
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=dtype).reshape(-1, ncols))
+
+    data = np.concatenate(chunks) if chunks else np.empty((0, ncols), dtype=dtype)
+    return tuple(np.ascontiguousarray(data[:, i]) for i in range(ncols))
+
+
+class ArtistDictionary:
+    """artist_id <-> dense code 0..n-1, plus the names for each code."""
+
+    def __init__(self, conn):
+        ids, = load_columns(conn, "SELECT id FROM artists ORDER BY id", dtype=np.int64)
+        self.ids = ids
+        self.names = [row[0] for row in conn.execute("SELECT name FROM artists ORDER BY id")]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self, artist_ids):
+        return np.searchsorted(self.ids, artist_ids.astype(np.int64))
+
+
+def load_chart_data(conn, artists):
+    track_id, position, artist_id = load_columns(conn, CHART_ROWS_SQL)
+    return ChartData(track_id.astype(np.int64), position, artists.encode(artist_id))
+
+
+def load_lyric_data(conn, artists):
+    track_id, artist_id, char_count, word_count = load_columns(conn, LYRIC_ROWS_SQL)
+    return LyricData(track_id.astype(np.int64), artists.encode(artist_id), char_count, word_count)
+
+
+# ----------------------------------------------------------
+# Vectorized operations
+# ----------------------------------------------------------
+
+def group_mean(codes, values, n_groups):
+    """(means, counts) per group code; NaN values are ignored, empty groups are NaN."""
+    ok = np.isfinite(values)
+    counts = np.bincount(codes[ok], minlength=n_groups)
+    sums = np.bincount(codes[ok], weights=values[ok], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return means, counts
+
+
+def ranked_groups(names, means, counts, descending=False, limit=None):
+    """[(name, mean, count)] for non-empty groups, sorted by mean."""
+    present = np.flatnonzero(counts > 0)
+    order = np.argsort(means[present], kind="stable")
+    if descending:
+        order = order[::-1]
+    if limit is not None:
+        order = order[:limit]
+    return [(names[i], float(means[i]), int(counts[i])) for i in present[order]]
+
+
+def lookup_by_track(chart, lyrics, column):
+    """
+    For every chart row, the lyrics column value of its track (NaN if the
+    track has no lyrics). A sorted-array join instead of a dict per row.
+    """
+    order = np.argsort(lyrics.track_id)
+    sorted_ids = lyrics.track_id[order]
+    values = column[order]
+
+    pos = np.searchsorted(sorted_ids, chart.track_id)
+    pos = np.clip(pos, 0, max(len(sorted_ids) - 1, 0))
+    result = np.full(len(chart.track_id), np.nan)
+    if len(sorted_ids):
+        found = sorted_ids[pos] == chart.track_id
+        result[found] = values[pos[found]]
+    return result
+
+
+def correlation(x, y):
+    """Pearson r over rows where both values are present (NaN if < 2 rows)."""
+    ok = np.isfinite(x) & np.isfinite(y)
+    if ok.sum() < 2:
+        return float("nan")
+    return float(np.corrcoef(x[ok], y[ok])[0, 1])
+
+
+def histogram(values, bins=25):
+    """(counts, edges) like matplotlib's hist, ignoring NaN."""
+    return np.histogram(values[np.isfinite(values)], bins=bins)
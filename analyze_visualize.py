@@ -1,67 +1,122 @@
 # analyze_visualize.py
 # Analysis + visualization for SI 201 final project
 # Requires: tracks, artists, lyrics, chart_popularity tables
-
-import sqlite3
+#
+# All data is read once over a single connection, then each figure is
+# drawn in a process pool on matplotlib's Agg backend. A fingerprint of
+# every figure's input data is kept in charts/.render_cache.json, and
+# figures whose data hasn't changed since the last render are skipped.
+#
+#   python analyze_visualize.py [--force] [--workers N]
+#
+# matplotlib is only imported by the draw functions (in the render
+# workers), and nothing is written to disk until main() runs.
+
+import argparse
+import hashlib
+import json
 import os
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import analytics
+from db_setup import get_connection
 
-DB_NAME = "music_project.db"
+CHARTS_DIR = "charts"
+RENDER_CACHE = os.path.join(CHARTS_DIR, ".render_cache.json")
 
-# Ensure folder exists
-os.makedirs("charts", exist_ok=True)
+# Bump when figure styling changes so cached PNGs get redrawn.
+RENDER_VERSION = 1
 
 # Red-only styling (no blue)
 RED = "red"
 DARK_RED = "darkred"
 
 
-def fetch_query(query, params=()):
-    """Helper to run a SQL query and return results."""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute(query, params)
-    rows = cur.fetchall()
+# Queries (also checked by check_query_plans.py)
+# Per-artist averages read the summary tables kept by db_setup's triggers.
+AVG_RANK_TOP20_SQL = """
+    SELECT artists.name,
+           CAST(artist_rank_summary.rank_sum AS REAL) / artist_rank_summary.rank_count
+               AS avg_rank
+    FROM artist_rank_summary
+    JOIN artists ON artists.id = artist_rank_summary.artist_id
+    WHERE artist_rank_summary.rank_count > 0
+    ORDER BY avg_rank ASC
+    LIMIT 20;
+"""
+
+AVG_LYRICS_LENGTH_TOP20_SQL = """
+    SELECT artists.name,
+           CAST(artist_lyrics_summary.length_sum AS REAL) / artist_lyrics_summary.lyrics_count
+               AS avg_length,
+           artist_lyrics_summary.lyrics_count
+    FROM artist_lyrics_summary
+    JOIN artists ON artists.id = artist_lyrics_summary.artist_id
+    WHERE artist_lyrics_summary.lyrics_count > 0
+    ORDER BY avg_length DESC
+    LIMIT 20;
+"""
+
+
+def pyplot():
+    """matplotlib.pyplot on the non-interactive Agg backend, imported on first use."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def fetch_report_data():
+    """Everything the four figures need, read over one read-only connection."""
+    conn = get_connection(read_only=True)
+    avg_rank_rows = conn.execute(AVG_RANK_TOP20_SQL).fetchall()
+    avg_length_rows = conn.execute(AVG_LYRICS_LENGTH_TOP20_SQL).fetchall()
+    artists = analytics.ArtistDictionary(conn)
+    chart = analytics.load_chart_data(conn, artists)
+    lyrics = analytics.load_lyric_data(conn, artists)
     conn.close()
-    return rows
+
+    return {
+        "avg_rank_rows": avg_rank_rows,
+        "avg_length_rows": avg_length_rows,
+        "chart": chart,
+        "lyrics": lyrics,
+    }
 
 
 # ----------------------------------------------------------------------
 # 1. Average chart rank per artist
 # ----------------------------------------------------------------------
 
-def avg_chart_rank_per_artist():
+def avg_chart_rank_per_artist(data):
     print("\n=== Average chart rank per artist ===")
 
-    query = """
-        SELECT artists.name, AVG(chart_popularity.chart_position)
-        FROM chart_popularity
-        JOIN tracks ON tracks.id = chart_popularity.track_id
-        JOIN artists ON artists.id = tracks.artist_id
-        GROUP BY artists.name
-        ORDER BY AVG(chart_popularity.chart_position) ASC
-        LIMIT 20;
-    """
-
-    data = fetch_query(query)
+    rows = data["avg_rank_rows"]
 
-    if not data:
+    if not rows:
         print("No matching chart + track data.")
         return None
 
-    for name, avg_rank in data:
+    for name, avg_rank in rows:
         print(f"{name:<25}  avg rank: {avg_rank:.2f}")
 
-    artists = [row[0] for row in data]
-    ranks = [row[1] for row in data]
+    return {
+        "artists": [row[0] for row in rows],
+        "ranks": [row[1] for row in rows],
+    }
+
 
+def draw_avg_chart_rank(inputs, path):
+    plt = pyplot()
     plt.figure(figsize=(10, 6))
-    plt.barh(artists, ranks, color=RED, edgecolor=DARK_RED)
+    plt.barh(inputs["artists"], inputs["ranks"], color=RED, edgecolor=DARK_RED)
     plt.xlabel("Average Chart Rank (lower is better)")
     plt.title("Average Chart Rank per Artist")
     plt.gca().invert_yaxis()
     plt.tight_layout()
-    plt.savefig("charts/avg_chart_rank.png")
+    plt.savefig(path)
     plt.close()
 
 
@@ -69,125 +124,199 @@ def avg_chart_rank_per_artist():
 # 2. Lyrics length vs. chart rank
 # ----------------------------------------------------------------------
 
-def lyrics_vs_chart_rank():
+def lyrics_vs_chart_rank(data):
     print("\n=== Lyrics length vs chart rank ===")
 
-    query = """
-        SELECT chart_popularity.chart_position, lyrics.lyrics_text
-        FROM chart_popularity
-        JOIN lyrics ON lyrics.track_id = chart_popularity.track_id;
-    """
-
-    rows = fetch_query(query)
+    chart, lyrics = data["chart"], data["lyrics"]
 
-    if not rows:
+    if not len(chart.position) or not len(lyrics.track_id):
         print("No joined lyrics + chart data available.")
-        return
-
-    x_positions = []
-    y_wordcounts = []
+        return None
 
-    for pos, text in rows:
-        if text:
-            wc = len(text.split())
-            x_positions.append(pos)
-            y_wordcounts.append(wc)
+    word_counts = analytics.lookup_by_track(chart, lyrics, lyrics.word_count)
+    usable = word_counts > 0
+    x_positions = chart.position[usable]
+    y_wordcounts = word_counts[usable]
 
-    if not x_positions:
+    if not len(x_positions):
         print("No usable data points for scatter plot.")
-        return
+        return None
+
+    print(f"Correlation (rank vs word count): r = {analytics.correlation(x_positions, y_wordcounts):.3f}")
+
+    return {"x_positions": x_positions, "y_wordcounts": y_wordcounts}
+
 
+def draw_lyrics_vs_chart_rank(inputs, path):
+    plt = pyplot()
     plt.figure(figsize=(10, 6))
-    plt.scatter(x_positions, y_wordcounts, color=RED, edgecolors=DARK_RED)
+    plt.scatter(inputs["x_positions"], inputs["y_wordcounts"], color=RED, edgecolors=DARK_RED)
     plt.xlabel("Chart Rank (1 = highest)")
     plt.ylabel("Lyrics Word Count")
     plt.title("Lyrics Length vs Chart Rank")
     plt.tight_layout()
-    plt.savefig("charts/lyrics_vs_chart_rank.png")
+    plt.savefig(path)
     plt.close()
 
-    print("Saved: charts/lyrics_vs_chart_rank.png")
-
 
 # ----------------------------------------------------------------------
 # 3. Lyrics length per artist
 # ----------------------------------------------------------------------
 
-def avg_lyrics_length_per_artist():
+def avg_lyrics_length_per_artist(data):
     print("\n=== Average lyrics length per artist ===")
 
-    query = """
-        SELECT artists.name, AVG(LENGTH(lyrics.lyrics_text)), COUNT(*)
-        FROM lyrics
-        JOIN tracks ON tracks.id = lyrics.track_id
-        JOIN artists ON artists.id = tracks.artist_id
-        GROUP BY artists.name
-        ORDER BY AVG(LENGTH(lyrics.lyrics_text)) DESC
-        LIMIT 20;
-    """
-
-    data = fetch_query(query)
+    rows = data["avg_length_rows"]
 
-    if not data:
+    if not rows:
         print("No lyrics stored.")
-        return
+        return None
 
-    for name, avg_len, count in data:
+    for name, avg_len, count in rows:
         print(f"{name:<25} avg length: {avg_len:.1f} chars   from {count} song(s)")
 
-    artists = [row[0] for row in data]
-    avg_lengths = [row[1] for row in data]
+    return {
+        "artists": [row[0] for row in rows],
+        "avg_lengths": [row[1] for row in rows],
+    }
 
+
+def draw_avg_lyrics_length(inputs, path):
+    plt = pyplot()
     plt.figure(figsize=(10, 6))
-    plt.barh(artists, avg_lengths, color=RED, edgecolor=DARK_RED)
+    plt.barh(inputs["artists"], inputs["avg_lengths"], color=RED, edgecolor=DARK_RED)
     plt.xlabel("Average Lyrics Length (characters)")
     plt.title("Top Artists by Lyrics Length")
     plt.gca().invert_yaxis()
     plt.tight_layout()
-    plt.savefig("charts/avg_lyrics_length.png")
+    plt.savefig(path)
     plt.close()
 
-    print("Saved: charts/avg_lyrics_length.png")
-
 
 # ----------------------------------------------------------------------
 # 4. Chart rank histogram
 # ----------------------------------------------------------------------
 
-def chart_rank_histogram():
+def chart_rank_histogram(data):
     print("\n=== Chart rank distribution ===")
 
-    rows = fetch_query("SELECT chart_position FROM chart_popularity;")
+    chart = data["chart"]
 
-    if not rows:
+    if not len(chart.position):
         print("No chart data found.")
-        return
+        return None
+
+    # Binned in NumPy; matplotlib only draws the 25 bars.
+    counts, edges = analytics.histogram(chart.position, bins=25)
+    return {"counts": counts, "edges": edges}
 
-    positions = [row[0] for row in rows]
 
+def draw_chart_rank_histogram(inputs, path):
+    plt = pyplot()
+    edges = inputs["edges"]
     plt.figure(figsize=(8, 5))
-    plt.hist(positions, bins=25, color=RED, edgecolor=DARK_RED)
+    plt.hist(edges[:-1], bins=edges, weights=inputs["counts"], color=RED, edgecolor=DARK_RED)
     plt.xlabel("Chart Position")
     plt.ylabel("Frequency")
     plt.title("Distribution of Chart Ranks")
     plt.tight_layout()
-    plt.savefig("charts/chart_rank_histogram.png")
+    plt.savefig(path)
     plt.close()
 
-    print("Saved: charts/chart_rank_histogram.png")
+
+# (file name, prepare(data) -> inputs or None, draw(inputs, path))
+FIGURES = [
+    ("avg_chart_rank.png", avg_chart_rank_per_artist, draw_avg_chart_rank),
+    ("lyrics_vs_chart_rank.png", lyrics_vs_chart_rank, draw_lyrics_vs_chart_rank),
+    ("avg_lyrics_length.png", avg_lyrics_length_per_artist, draw_avg_lyrics_length),
+    ("chart_rank_histogram.png", chart_rank_histogram, draw_chart_rank_histogram),
+]
+
+
+# ----------------------------------------------------------------------
+# Render cache
+# ----------------------------------------------------------------------
+
+def fingerprint(filename, inputs):
+    """Hash of a figure's input data (arrays hashed by their raw bytes)."""
+    h = hashlib.sha256(f"{filename}:{RENDER_VERSION}".encode())
+    for key in sorted(inputs):
+        value = inputs[key]
+        h.update(key.encode())
+        if isinstance(value, np.ndarray):
+            h.update(f"{value.dtype}{value.shape}".encode())
+            h.update(np.ascontiguousarray(value).tobytes())
+        else:
+            h.update(repr(value).encode())
+    return h.hexdigest()
+
+
+def load_render_cache():
+    try:
+        with open(RENDER_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_render_cache(cache):
+    tmp = RENDER_CACHE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, RENDER_CACHE)
+
+
+def render_figure(draw, inputs, path):
+    """Worker: draw one figure to path."""
+    draw(inputs, path)
+    return path
 
 
 # ----------------------------------------------------------------------
 # Main runner
 # ----------------------------------------------------------------------
 
-def main():
-    avg_chart_rank_per_artist()
-    lyrics_vs_chart_rank()
-    avg_lyrics_length_per_artist()
-    chart_rank_histogram()
-    print("\nDone. Charts saved in /charts/ folder.")
+def main(force=False, workers=None):
+    os.makedirs(CHARTS_DIR, exist_ok=True)
+    data = fetch_report_data()
+    cache = {} if force else load_render_cache()
+
+    pending = []   # (filename, draw, inputs, path, digest)
+    for filename, prepare, draw in FIGURES:
+        inputs = prepare(data)
+        if inputs is None:
+            continue
+        path = os.path.join(CHARTS_DIR, filename)
+        digest = fingerprint(filename, inputs)
+        if cache.get(filename) == digest and os.path.exists(path):
+            print(f"Unchanged: {path}")
+            continue
+        pending.append((filename, draw, inputs, path, digest))
+
+    if len(pending) == 1:
+        # Not worth starting a pool for one figure.
+        filename, draw, inputs, path, digest = pending[0]
+        render_figure(draw, inputs, path)
+        cache[filename] = digest
+        print(f"Saved: {path}")
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            futures = [
+                (filename, digest, pool.submit(render_figure, draw, inputs, path))
+                for filename, draw, inputs, path, digest in pending
+            ]
+            for filename, digest, future in futures:
+                print(f"Saved: {future.result()}")
+                cache[filename] = digest
+
+    save_render_cache(cache)
+    print(f"\nDone. {len(pending)} chart(s) rendered, saved in /{CHARTS_DIR}/ folder.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Render the analysis charts.")
+    parser.add_argument("--force", action="store_true", help="re-render every chart")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    main(force=args.force, workers=args.workers)
@@ -0,0 +1,72 @@
+# bench_chart_parser.py
+# Offline check + benchmark for the chart parser backends.
+# For every saved chart page in the fixture directory it verifies that all
+# installed backends return identical entries, then reports pages parsed
+# per second for each backend. Exits 1 if any backend disagrees.
+#
+#   python bench_chart_parser.py [fixtures/] [--seconds 3]
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import chart_parser
+
+
+def load_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((path, f.read()))
+    return pages
+
+
+def check_identical(pages, backends):
+    """Return [(path, backend)] for backends that differ from bs4."""
+    mismatches = []
+    for path, html in pages:
+        expected = chart_parser.parse_bs4(html)
+        for name in backends:
+            if chart_parser.BACKENDS[name](html) != expected:
+                mismatches.append((path, name))
+    return mismatches
+
+
+def pages_per_second(parse, pages, seconds):
+    parsed = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _, html in pages:
+            parse(html)
+            parsed += 1
+    return parsed / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="fixtures")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    pages = load_pages(args.directory)
+    if not pages:
+        print(f"No .html fixtures in {args.directory}")
+        return 1
+
+    backends = chart_parser.available_backends()
+    mismatches = check_identical(pages, backends)
+    for path, name in mismatches:
+        print(f"MISMATCH: {name} differs from bs4 on {path}")
+
+    print(f"{len(pages)} fixture page(s), backends: {', '.join(backends)}")
+    for name in backends:
+        rate = pages_per_second(chart_parser.BACKENDS[name], pages, args.seconds)
+        print(f"{name:<8} {rate:8.1f} pages/s")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
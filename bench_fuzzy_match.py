@@ -0,0 +1,140 @@
+# bench_fuzzy_match.py
+# Benchmark: trigram-blocked FuzzyMatcher vs brute-force scoring.
+# Builds a synthetic catalog and chart rows with typical Billboard noise
+# (case, punctuation, glued "Featuring" credits, small typos), then times
+# both matchers. Brute force is timed on a sample and extrapolated.
+# Some artists also get near-duplicate titles ("Part 1" / "Part 2",
+# "Love" / "Lover", "Hell" / "Hello"); chart rows for the sibling that is
+# not in the catalog must come back unmatched, and are counted separately.
+#
+#   python bench_fuzzy_match.py --tracks 500000 --rows 100000
+
+import argparse
+import random
+import string
+import time
+
+from fuzzy_matcher import FuzzyMatcher
+
+WORDS = [
+    "love", "night", "christmas", "heart", "baby", "snow", "fire", "home",
+    "dance", "golden", "summer", "blue", "wonderful", "time", "little",
+    "again", "dream", "country", "river", "midnight", "sugar", "tears",
+    "daisies", "girl", "man", "cold", "outside", "bell", "rock", "tree",
+]
+NEAR_DUP_SHARE = 0.05     # catalog tracks that get a same-artist near-duplicate
+
+
+def random_title(rng):
+    words = rng.sample(WORDS, rng.randint(1, 4))
+    words.append("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))))
+    rng.shuffle(words)
+    return " ".join(w.capitalize() for w in words)
+
+
+def random_artist(rng):
+    first = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 7))).capitalize()
+    last = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))).capitalize()
+    return f"{first} {last}"
+
+
+def add_noise(rng, artist, title):
+    """Make a chart-style credit/title that won't match exactly."""
+    choice = rng.random()
+    if choice < 0.3:
+        artist = f"{artist}Featuring{random_artist(rng)}"
+    elif choice < 0.5:
+        title = title.upper() + "!"
+    if rng.random() < 0.5 and len(title) > 5:
+        i = rng.randrange(len(title) - 1)
+        title = title[:i] + title[i + 1] + title[i] + title[i + 2:]
+    return artist, title
+
+
+def near_duplicates(rng):
+    """Two different songs one artist could have: ("Part 1", "Part 2"), ("Love", "Lover")."""
+    base = rng.choice(WORDS).capitalize() if rng.random() < 0.5 else random_title(rng)
+    if rng.random() < 0.5:
+        n = rng.randint(1, 3)
+        return f"{base} Part {n}", f"{base} Part {n + 1}"
+    return base, base + rng.choice("rsoy")
+
+
+def build(n_tracks, n_rows, seed=201):
+    """
+    (catalog, rows, unmatched): rows are noisy chart rows for catalog tracks,
+    unmatched are rows for near-duplicate songs missing from the catalog.
+    """
+    rng = random.Random(seed)
+    catalog = [(i, random_artist(rng), random_title(rng)) for i in range(1, n_tracks + 1)]
+
+    missing = []
+    for i in rng.sample(range(n_tracks), int(n_tracks * NEAR_DUP_SHARE)):
+        track_id, artist, _ = catalog[i]
+        title, sibling = near_duplicates(rng)
+        if rng.random() < 0.5:
+            title, sibling = sibling, title
+        catalog[i] = (track_id, artist, title)
+        if rng.random() < 0.5:
+            catalog.append((len(catalog) + 1, artist, sibling))
+        else:
+            missing.append((artist, sibling))
+
+    rows = []
+    for _ in range(n_rows):
+        track_id, artist, title = rng.choice(catalog)
+        rows.append((track_id,) + add_noise(rng, artist, title))
+    unmatched = [add_noise(rng, artist, title) for artist, title in missing]
+    return catalog, rows, unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=500000)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--brute-sample", type=int, default=20)
+    args = parser.parse_args()
+
+    catalog, rows, unmatched = build(args.tracks, args.rows)
+
+    start = time.perf_counter()
+    matcher = FuzzyMatcher(catalog)
+    build_time = time.perf_counter() - start
+    print(f"Index build: {len(catalog)} tracks in {build_time:.1f}s")
+
+    start = time.perf_counter()
+    correct = 0
+    for expected, artist, title in rows:
+        track_id, _ = matcher.match(artist, title)
+        correct += track_id == expected
+    blocked_time = time.perf_counter() - start
+    print(
+        f"Blocked:     {args.rows} rows in {blocked_time:.1f}s "
+        f"({args.rows / blocked_time:,.0f} rows/s), "
+        f"accuracy {correct / args.rows:.1%}"
+    )
+
+    false_matches = sum(matcher.match(artist, title)[0] is not None
+                        for artist, title in unmatched)
+    print(
+        f"Near-duplicates not in catalog: {false_matches}/{len(unmatched)} "
+        f"wrongly matched ({false_matches / max(len(unmatched), 1):.1%})"
+    )
+
+    sample = rows[:args.brute_sample]
+    start = time.perf_counter()
+    agree = 0
+    for _, artist, title in sample:
+        brute = matcher.match_brute_force(artist, title)
+        agree += brute[0] == matcher.match(artist, title)[0]
+    per_row = (time.perf_counter() - start) / len(sample)
+    print(
+        f"Brute force: {per_row * 1000:.0f} ms/row, "
+        f"~{per_row * args.rows / 60:,.0f} min for {args.rows} rows "
+        f"(agrees with blocked on {agree}/{len(sample)} sampled rows)"
+    )
+    print(f"Speedup: ~{per_row * args.rows / blocked_time:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
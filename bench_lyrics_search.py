@@ -0,0 +1,151 @@
+# bench_lyrics_search.py
+# Benchmark: lyrics_fts queries (lyrics_search.py) on a synthetic corpus.
+# Builds a database with the real schema and triggers, saves n songs of
+# Zipf-distributed words the way gather_lyrics.save_lyrics does (blob,
+# lyrics row, index row), then times ranked, unranked, phrase, prefix and
+# document frequency queries. Exits 1 if any p95 is over --budget-ms.
+#
+#   python bench_lyrics_search.py --songs 1000000 [--trigram]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import db_setup
+import lyrics_search
+import lyrics_store
+from lyric_stats import lyric_stats
+
+VOCABULARY = 20000
+LINES = (20, 50)
+WORDS_PER_LINE = (4, 9)
+QUERIES_PER_KIND = 50
+
+
+def make_words(rng):
+    words = ["snow", "love", "night", "christmas", "heart", "baby", "bell", "tree"]
+    while len(words) < VOCABULARY:
+        words.append("".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9))))
+    return words
+
+
+def build_corpus(path, n_songs, tokenizer, seed=201):
+    """Fill a fresh database with n_songs lyrics; returns the vocabulary."""
+    db_setup.DB_NAME = path
+    db_setup.LYRICS_FTS_TOKENIZER = tokenizer
+    db_setup.create_tables()
+
+    rng = random.Random(seed)
+    words = make_words(rng)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+
+    conn = db_setup.get_connection()
+    conn.executemany(
+        "INSERT INTO artists (id, name) VALUES (?, ?)",
+        ((i, f"Artist {i}") for i in range(1, n_songs // 10 + 2)),
+    )
+    conn.executemany(
+        "INSERT INTO tracks (id, artist_id, title) VALUES (?, ?, ?)",
+        ((i, i // 10 + 1, f"Song {i}") for i in range(1, n_songs + 1)),
+    )
+
+    for start in range(1, n_songs + 1, 10000):
+        batch = []
+        for track_id in range(start, min(start + 10000, n_songs + 1)):
+            lines = (
+                " ".join(rng.choices(words, cum_weights=cum_weights,
+                                     k=rng.randint(*WORDS_PER_LINE)))
+                for _ in range(rng.randint(*LINES))
+            )
+            batch.append((track_id, "\n".join(lines)))
+        conn.executemany(lyrics_store.SAVE_BLOB_SQL,
+                         (lyrics_store.blob_params(text) for _, text in batch))
+        conn.executemany(
+            """
+            INSERT INTO lyrics
+                (track_id, content_hash, char_count, word_count, line_count, unique_word_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            ((track_id, lyrics_store.content_hash(text)) + lyric_stats(text)
+             for track_id, text in batch),
+        )
+        conn.executemany(lyrics_store.INDEX_LYRICS_SQL, batch)
+        conn.commit()
+        print(f"  {min(start + 9999, n_songs)} songs indexed", end="\r", flush=True)
+    print()
+    conn.close()
+    return words
+
+
+def time_queries(label, func, args_list):
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    p50 = times[len(times) // 2]
+    p95 = times[min(int(len(times) * 0.95), len(times) - 1)]
+    print(f"{label:<26} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+    return p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lyrics full-text search.")
+    parser.add_argument("--songs", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--trigram", action="store_true", help="trigram tokenizer")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if any query kind's p95 is above this")
+    args = parser.parse_args()
+
+    tokenizer = lyrics_search.TRIGRAM if args.trigram else db_setup.LYRICS_FTS_TOKENIZER
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lyrics_bench.db")
+        start = time.perf_counter()
+        words = build_corpus(path, args.songs, tokenizer)
+        print(f"Built {args.songs} songs ({tokenizer}) in {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(path) / 1e6:.0f} MB")
+
+        conn = db_setup.get_connection(read_only=True)
+        common = words[:8]
+        rare = rng.sample(words[1000:], QUERIES_PER_KIND)
+        mid = rng.sample(words[50:1000], QUERIES_PER_KIND)
+        pairs = [f"{rng.choice(words[:200])} {rng.choice(words[:200])}"
+                 for _ in range(QUERIES_PER_KIND)]
+
+        p95s = [
+            time_queries("ranked, common term", lyrics_search.search,
+                         [(conn, w, args.limit) for w in common]),
+            time_queries("unranked, common term", lyrics_search.search,
+                         [(conn, w, args.limit, False) for w in common]),
+            time_queries("ranked, mid-frequency", lyrics_search.search,
+                         [(conn, w, args.limit) for w in mid]),
+            time_queries("ranked, rare term", lyrics_search.search,
+                         [(conn, w, args.limit) for w in rare]),
+            time_queries("phrase (2 words)", lyrics_search.search_phrase,
+                         [(conn, p, args.limit) for p in pairs]),
+            time_queries("prefix (3 letters)", lyrics_search.search_prefix,
+                         [(conn, w[:3], args.limit) for w in mid]),
+            time_queries("document frequency", lyrics_search.document_frequency,
+                         [(conn, w) for w in mid]),
+        ]
+        conn.close()
+
+    if args.budget_ms is not None and max(p95s) > args.budget_ms:
+        print(f"FAIL: p95 {max(p95s):.1f} ms is over the {args.budget_ms} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
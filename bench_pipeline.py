@@ -0,0 +1,436 @@
+# bench_pipeline.py
+# Offline throughput benchmark for the gather stages and run_pipeline.
+# Starts local stand-in HTTP servers for Genius, lyrics.ovh, TheAudioDB and
+# billboard.com (each with configurable latency, error rate, 404 ratio and
+# rate limit), points the modules' URLs at them, and runs every stage
+# against a synthetic catalog in a temporary database.
+#
+# Per stage it reports items/s, HTTP latency p50/p95/p99 (client side) and
+# DB write rate. One JSON line per run, tagged with the git commit, is
+# appended to --output so results can be compared across commits.
+#
+#   python bench_pipeline.py [--tracks 1000 10000] [--api lyrics:latency=0.02,error=0.05]
+
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import db_setup
+import gather_audiodb
+import gather_charts
+import gather_genius
+import gather_lyrics
+import http_cache
+import http_client
+import lyrics_api
+import metrics
+import pipeline_log
+import run_pipeline
+import theaudiodb_api
+
+OUTPUT = "bench_pipeline_results.jsonl"
+
+# Stand-in behaviour per API. latency in seconds (+/- jitter fraction),
+# error = share of 500s, not_found = share of misses (deterministic per
+# URL), rate = requests/s before the server answers 429 (0 = unlimited).
+API_DEFAULTS = {
+    "genius": {"latency": 0.005, "jitter": 0.5, "error": 0.0, "not_found": 0.05, "rate": 0},
+    "lyrics": {"latency": 0.005, "jitter": 0.5, "error": 0.01, "not_found": 0.1, "rate": 0},
+    "audiodb": {"latency": 0.005, "jitter": 0.5, "error": 0.01, "not_found": 0.1, "rate": 0},
+    "billboard": {"latency": 0.02, "jitter": 0.5, "error": 0.01, "not_found": 0.0, "rate": 0},
+}
+
+CLIENT_RATE = 10000        # client-side token buckets, so the servers set the pace
+LYRICS_WORKERS = 8
+CHART_WEEKS = 52
+
+
+# ----------------------------------------------------------
+# Stand-in servers
+# ----------------------------------------------------------
+
+class ServerLimiter:
+    """Non-blocking token bucket: allow() is False when the client is over rate."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def misses(path, share):
+    """Same answer for the same URL every time, like a real missing resource."""
+    return zlib.crc32(path.encode()) / 2**32 < share
+
+
+def chart_page(catalog, seed):
+    rng = random.Random(seed)
+    rows = rng.sample(catalog, min(100, len(catalog)))
+    items = "".join(
+        f'<li class="o-chart-results-list__item"><h3 class="c-title">{title}</h3>'
+        f'<span class="c-label">{artist}</span></li>\n'
+        for artist, title in rows
+    )
+    return f"<html><body><ul>\n{items}</ul></body></html>"
+
+
+def lyrics_text(artist, title):
+    rng = random.Random(f"{artist}|{title}")
+    lines = [
+        " ".join(rng.choice(("love", "night", "baby", "snow", "heart", "dance", title))
+                 for _ in range(rng.randint(4, 9)))
+        for _ in range(rng.randint(20, 60))
+    ]
+    return "\n".join(lines)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real APIs
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, content_type="application/json"):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        server.requests += 1
+
+        latency = config["latency"] * (1 + config["jitter"] * (2 * random.random() - 1))
+        if latency > 0:
+            time.sleep(latency)
+
+        if not server.limiter.allow():
+            return self.send(429, '{"error": "rate limited"}')
+        if random.random() < config["error"]:
+            return self.send(500, '{"error": "stand-in error"}')
+
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        missing = misses(self.path, config["not_found"])
+        getattr(self, "handle_" + server.api)(parts.path, query, missing)
+
+    def handle_genius(self, path, query, missing):
+        hits = [] if missing else [{"result": {
+            "id": zlib.crc32(query.get("q", "").encode()),
+            "title": query.get("q", ""),
+            "primary_artist": {"id": zlib.crc32(query.get("q", "").split(" Song")[0].encode())},
+            "url": f"http://genius.invalid/songs/{zlib.crc32(query.get('q', '').encode())}",
+        }}]
+        self.send(200, json.dumps({"response": {"hits": hits}}))
+
+    def handle_lyrics(self, path, query, missing):
+        _, _, artist, title = (path.split("/", 3) + ["", ""])[:4]
+        if missing:
+            return self.send(404, '{"error": "No lyrics found"}')
+        text = lyrics_text(unquote(artist), unquote(title))
+        self.send(200, json.dumps({"lyrics": text}))
+
+    def handle_audiodb(self, path, query, missing):
+        if missing:
+            return self.send(200, '{"track": null}')
+        track = {
+            "strTrack": query.get("t", ""),
+            "strGenre": "Pop",
+            "strMood": "Happy",
+            "intTempo": "120",
+            "strAlbum": "Bench Album",
+            "strTrackThumb": "http://audiodb.invalid/thumb.jpg",
+        }
+        self.send(200, json.dumps({"track": [track]}))
+
+    def handle_billboard(self, path, query, missing):
+        if missing:
+            return self.send(404, "not found", "text/html")
+        self.send(200, chart_page(self.server.catalog, path), "text/html; charset=utf-8")
+
+
+def start_standin(api, config, catalog):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.api = api
+    server.config = config
+    server.catalog = catalog
+    server.limiter = ServerLimiter(config["rate"])
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def point_modules_at(servers):
+    """Repoint every module-level API URL at the local stand-ins."""
+    base = {api: f"http://127.0.0.1:{s.server_port}" for api, s in servers.items()}
+
+    gather_genius.BASE_URL = base["genius"] + "/search"
+    gather_genius.GENIUS_TOKEN = "bench-token"
+    gather_lyrics.LYRICS_URL = base["lyrics"] + "/v1/{artist}/{title}"
+    lyrics_api.BASE_URL = base["lyrics"] + "/v1"
+    theaudiodb_api.BASE_URL = base["audiodb"] + "/api/v1/json/2"
+    gather_charts.CHART_URL = base["billboard"] + "/charts/hot-100"
+    gather_charts.CHART_DATE_URL = base["billboard"] + "/charts/hot-100/{date}/"
+
+    gather_lyrics.LYRICS_RATE = gather_lyrics.LYRICS_BURST = CLIENT_RATE
+    gather_charts.BILLBOARD_RATE = gather_charts.BILLBOARD_BURST = CLIENT_RATE
+    theaudiodb_api.AUDIODB_RATE = theaudiodb_api.AUDIODB_BURST = CLIENT_RATE
+    http_cache.ENABLED = False
+
+
+# ----------------------------------------------------------
+# Synthetic catalog + database
+# ----------------------------------------------------------
+
+def make_catalog(n_tracks, prefix="Bench"):
+    n_artists = max(n_tracks // 10, 1)
+    return [(f"{prefix} Artist {i % n_artists}", f"{prefix} Song {i}") for i in range(n_tracks)]
+
+
+def seed_database(path, catalog):
+    db_setup.DB_NAME = path
+    db_setup.create_tables()
+
+    conn = db_setup.get_connection()
+    artists = sorted({artist for artist, _ in catalog})
+    conn.executemany("INSERT OR IGNORE INTO artists (name) VALUES (?)", ((a,) for a in artists))
+    ids = dict(conn.execute("SELECT name, id FROM artists"))
+    conn.executemany(
+        "INSERT OR IGNORE INTO tracks (artist_id, title) VALUES (?, ?)",
+        ((ids[artist], title) for artist, title in catalog),
+    )
+    conn.commit()
+    conn.close()
+
+
+# ----------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(stage, items, unit, run):
+    """Run one stage; returns a result dict with throughput, latency and DB rates."""
+    samples = []
+    statuses = {}
+    real_get = http_client.get
+
+    def timed_get(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = real_get(*args, **kwargs)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            return resp
+        except Exception:
+            statuses["exception"] = statuses.get("exception", 0) + 1
+            raise
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    metrics.reset()
+    http_client.get = timed_get
+    error = None
+    start = time.perf_counter()
+    try:
+        run()
+    except Exception as e:
+        error = repr(e)
+    finally:
+        seconds = time.perf_counter() - start
+        http_client.get = real_get
+
+    counters = metrics.summary()["counters"]
+    rows = sum(counters.get("db_rows_written_total", {}).values())
+    samples.sort()
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "stage": stage,
+        "items": items,
+        "unit": unit,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(items / seconds, 2) if seconds else None,
+        "requests": len(samples),
+        "requests_per_second": round(len(samples) / seconds, 2) if seconds else None,
+        "http_status": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "latency_p50_ms": ms(percentile(samples, 0.50)),
+        "latency_p95_ms": ms(percentile(samples, 0.95)),
+        "latency_p99_ms": ms(percentile(samples, 0.99)),
+        "db_rows_written": rows,
+        "db_rows_per_second": round(rows / seconds, 2) if seconds else None,
+        "error": error,
+    }
+
+
+def bench_size(n_tracks, tmp, args):
+    """Every stage, then the whole pipeline, against an n_tracks catalog."""
+    catalog = make_catalog(n_tracks)
+    new_songs = make_catalog(min(n_tracks, args.genius_songs), prefix="New")
+    results = []
+
+    # Individual stages on a seeded database
+    seed_database(os.path.join(tmp, f"stages-{n_tracks}.db"), catalog)
+
+    gather_genius.BATCH_LIMIT = len(new_songs)
+    results.append(measure("genius", len(new_songs), "songs",
+                           lambda: gather_genius.gather_genius_data(new_songs)))
+    total = n_tracks + len(new_songs)
+    results.append(measure("lyrics", total, "tracks",
+                           lambda: gather_lyrics.gather_lyrics(workers=args.lyrics_workers)))
+    results.append(measure("audiodb", total, "tracks", gather_audiodb.gather_audiodb))
+
+    end = datetime.date(2024, 12, 28)
+    start = end - datetime.timedelta(weeks=args.chart_weeks - 1)
+    results.append(measure("charts_backfill", args.chart_weeks, "pages",
+                           lambda: gather_charts.backfill_charts(start, end)))
+
+    # Whole pipeline on a fresh seeded database
+    seed_database(os.path.join(tmp, f"pipeline-{n_tracks}.db"), catalog)
+    run_pipeline.SONGS = new_songs
+    run_pipeline.GENIUS_BATCH_LIMIT = len(new_songs)
+    run_pipeline.TARGET_TOTAL = total
+    run_pipeline.LYRICS_WORKERS = args.lyrics_workers
+    run_pipeline.METRICS_JSON = os.path.join(tmp, "pipeline_metrics.json")
+    run_pipeline.METRICS_PROM = os.path.join(tmp, "pipeline_metrics.prom")
+    results.append(measure("run_pipeline", total, "tracks",
+                           lambda: run_pipeline.main(fresh=True, stream=args.stream)))
+
+    for result in results:
+        result["catalog_tracks"] = n_tracks
+    return results
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+        return commit, bool(dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def parse_api_option(text, configs):
+    """'lyrics:latency=0.02,error=0.05' -> updates configs['lyrics']."""
+    api, _, settings = text.partition(":")
+    if api not in configs:
+        raise SystemExit(f"Unknown API {api!r}; choose from {', '.join(configs)}")
+    for pair in filter(None, settings.split(",")):
+        key, _, value = pair.partition("=")
+        if key not in configs[api]:
+            raise SystemExit(f"Unknown setting {key!r} for {api}")
+        configs[api][key] = float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark.")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[1000],
+                        help="catalog sizes to run (e.g. 1000 10000 100000)")
+    parser.add_argument("--genius-songs", type=int, default=500,
+                        help="new songs sent through the Genius stage per size")
+    parser.add_argument("--lyrics-workers", type=int, default=LYRICS_WORKERS)
+    parser.add_argument("--chart-weeks", type=int, default=CHART_WEEKS)
+    parser.add_argument("--stream", action="store_true", help="run_pipeline in --stream mode")
+    parser.add_argument("--api", action="append", default=[], metavar="API:KEY=VALUE,...",
+                        help="override stand-in settings, e.g. lyrics:latency=0.05,rate=20")
+    parser.add_argument("--output", default=OUTPUT)
+    args = parser.parse_args()
+
+    configs = {api: dict(settings) for api, settings in API_DEFAULTS.items()}
+    for option in args.api:
+        parse_api_option(option, configs)
+
+    pipeline_log.configure("ERROR")     # injected 500s/404s would log every request
+    original_db = db_setup.DB_NAME
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_tracks in args.tracks:
+            catalog = make_catalog(n_tracks)
+            servers = {api: start_standin(api, configs[api], catalog) for api in configs}
+            point_modules_at(servers)
+            try:
+                results.extend(bench_size(n_tracks, tmp, args))
+            finally:
+                for server in servers.values():
+                    server.shutdown()
+                    server.server_close()
+                http_client.close_all()
+                db_setup.DB_NAME = original_db
+
+    print(f"{'tracks':>7} {'stage':<16} {'items/s':>9} {'req/s':>8} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'rows/s':>9}")
+    for r in results:
+        print(
+            f"{r['catalog_tracks']:>7} {r['stage']:<16} {r['items_per_second'] or 0:>9.1f} "
+            f"{r['requests_per_second'] or 0:>8.1f} {r['latency_p50_ms'] or 0:>7.1f} "
+            f"{r['latency_p95_ms'] or 0:>7.1f} {r['latency_p99_ms'] or 0:>7.1f} "
+            f"{r['db_rows_per_second'] or 0:>9.1f}"
+            + (f"  ERROR {r['error']}" if r["error"] else "")
+        )
+
+    commit, dirty = git_commit()
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "python": sys.version.split()[0],
+        "config": {
+            "apis": configs,
+            "genius_songs": args.genius_songs,
+            "lyrics_workers": args.lyrics_workers,
+            "chart_weeks": args.chart_weeks,
+            "stream": args.stream,
+        },
+        "results": results,
+    }
+    with open(args.output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {args.output}")
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
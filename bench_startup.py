@@ -0,0 +1,110 @@
+# bench_startup.py
+# Startup-time regression check.
+# Imports each entry point in a fresh interpreter with `python -X importtime`
+# and adds up the cumulative import time of the listed modules (interpreter
+# and site startup are not counted). The best of --runs runs is compared
+# against the budget below; exit code 1 if any scenario is over budget, or
+# if an import prints anything or creates files (modules must not have
+# import-time side effects).
+#
+#   python bench_startup.py [--runs 5] [--scale 1.0] [-v]
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# (scenario, modules imported in that order, budget in ms)
+SCENARIOS = [
+    ("run_pipeline", ["run_pipeline"], 40),
+    ("run_pipeline lyrics", ["run_pipeline", "gather_lyrics"], 60),
+    ("run_pipeline charts", ["run_pipeline", "gather_charts"], 80),
+    ("run_pipeline audiodb", ["run_pipeline", "gather_audiodb"], 60),
+    ("run_pipeline genius", ["run_pipeline", "gather_genius"], 60),
+    ("ingest_archive", ["ingest_archive"], 100),
+    ("calculations", ["calculations"], 250),
+    ("analyze_visualize", ["analyze_visualize"], 250),
+]
+
+
+def parse_importtime(stderr, modules):
+    """Sum the cumulative microseconds of the given top-level imports."""
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line.split("|")
+        # Top-level imports have a single space before the name; nested
+        # ones are indented further.
+        if name.startswith("  ") or name.strip() not in modules:
+            continue
+        total += int(cumulative_us)
+    return total
+
+
+def time_imports(modules, cwd):
+    """(milliseconds, stdout) for one fresh interpreter importing modules."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {', '.join(modules)} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr, modules) / 1000.0, proc.stdout
+
+
+def bench_startup(runs=5, scale=1.0, verbose=False):
+    """Return a list of failure messages (empty means every scenario passed)."""
+    failures = []
+
+    for scenario, modules, budget in SCENARIOS:
+        with tempfile.TemporaryDirectory() as cwd:
+            timings = []
+            for _ in range(runs):
+                ms, stdout = time_imports(modules, cwd)
+                timings.append(ms)
+                if stdout.strip():
+                    failures.append(f"{scenario}: import printed {stdout.strip()[:80]!r}")
+                    break
+            created = os.listdir(cwd)
+            if created:
+                failures.append(f"{scenario}: import created {', '.join(sorted(created))}")
+
+        best = min(timings)
+        limit = budget * scale
+        status = "ok" if best <= limit else "OVER BUDGET"
+        print(f"{scenario:<24} {best:7.1f} ms  (budget {limit:.0f} ms)  {status}")
+        if verbose:
+            print("    runs:", ", ".join(f"{t:.1f}" for t in timings))
+        if best > limit:
+            failures.append(f"{scenario}: {best:.1f} ms > {limit:.0f} ms")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time startup benchmark.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply every budget (e.g. 2 on slow machines)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    failures = bench_startup(args.runs, args.scale, args.verbose)
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,78 @@
 # calculations.py
 
-import sqlite3
-from db_setup import DB_NAME
+import sys
 
+import numpy as np
 
-# Pull data from the database and compute aggregates
+import analytics
+from db_setup import get_connection, rebuild_summary_tables
 
 
-def get_calculated_data():
-    conn = sqlite3.connect(DB_NAME)
+# Pull data from the database and compute aggregates
+
+# Per-artist averages come from the trigger-maintained summary tables
+# (see db_setup.create_summary_tables), so they cost one row per artist
+# no matter how many chart rows or lyrics are stored.
+AVG_RANK_SQL = """
+    SELECT 
+        artists.name,
+        CAST(artist_rank_summary.rank_sum AS REAL) / artist_rank_summary.rank_count
+            AS avg_rank
+    FROM artist_rank_summary
+    JOIN artists ON artists.id = artist_rank_summary.artist_id
+    WHERE artist_rank_summary.rank_count > 0
+    ORDER BY avg_rank ASC;
+"""
+
+AVG_LYRIC_LENGTH_SQL = """
+    SELECT 
+        artists.name,
+        CAST(artist_lyrics_summary.length_sum AS REAL) / artist_lyrics_summary.lyrics_count
+            AS avg_lyric_length
+    FROM artist_lyrics_summary
+    JOIN artists ON artists.id = artist_lyrics_summary.artist_id
+    WHERE artist_lyrics_summary.lyrics_count > 0
+    ORDER BY avg_lyric_length DESC;
+"""
+
+def get_summary_data():
+    """Per-artist average rank and lyric length, straight from the summary tables."""
+    conn = get_connection(read_only=True)
     cur = conn.cursor()
 
-    # Average chart rank per artist
-    cur.execute("""
-        SELECT 
-            artists.name,
-            AVG(chart_popularity.chart_position) AS avg_rank
-        FROM chart_popularity
-        JOIN tracks ON tracks.id = chart_popularity.track_id
-        JOIN artists ON artists.id = tracks.artist_id
-        GROUP BY artists.name
-        HAVING avg_rank IS NOT NULL
-        ORDER BY avg_rank ASC;
-    """)
+    cur.execute(AVG_RANK_SQL)
     avg_rank_rows = cur.fetchall()
 
-    # Average lyrics length per artist (skip NULL lyrics)
-    cur.execute("""
-        SELECT 
-            artists.name,
-            AVG(LENGTH(lyrics.lyrics_text)) AS avg_lyric_length
-        FROM lyrics
-        JOIN tracks ON tracks.id = lyrics.track_id
-        JOIN artists ON artists.id = tracks.artist_id
-        WHERE lyrics.lyrics_text IS NOT NULL
-        GROUP BY artists.name
-        HAVING avg_lyric_length IS NOT NULL
-        ORDER BY avg_lyric_length DESC;
-    """)
+    cur.execute(AVG_LYRIC_LENGTH_SQL)
     avg_lyric_rows = cur.fetchall()
 
-    # Lyrics length vs chart rank (scatter plot data)
-    cur.execute("""
-        SELECT 
-            LENGTH(lyrics.lyrics_text) AS lyric_length,
-            chart_popularity.chart_position
-        FROM lyrics
-        JOIN tracks ON tracks.id = lyrics.track_id
-        JOIN chart_popularity ON chart_popularity.track_id = tracks.id
-        WHERE lyrics.lyrics_text IS NOT NULL;
-    """)
-    scatter_rows = cur.fetchall()
+    conn.close()
+    return avg_rank_rows, avg_lyric_rows
 
-    # Distribution of chart positions (histogram)
-    cur.execute("""
-        SELECT chart_position
-        FROM chart_popularity;
-    """)
-    chart_positions = [row[0] for row in cur.fetchall()]
 
+def get_calculated_data():
+    """
+    Summary rows plus the row-level data for the plots, loaded through
+    analytics as NumPy arrays:
+      scatter_rows     (n, 2) array of [lyric length, chart position]
+      chart_positions  1-D array of every chart position
+    """
+    avg_rank_rows, avg_lyric_rows = get_summary_data()
+
+    conn = get_connection(read_only=True)
+    artists = analytics.ArtistDictionary(conn)
+    chart = analytics.load_chart_data(conn, artists)
+    lyrics = analytics.load_lyric_data(conn, artists)
     conn.close()
 
+    # Lyrics length vs chart rank (scatter plot data)
+    lengths = analytics.lookup_by_track(chart, lyrics, lyrics.char_count)
+    has_lyrics = np.isfinite(lengths)
+    scatter_rows = np.column_stack((lengths[has_lyrics], chart.position[has_lyrics]))
+
+    # Distribution of chart positions (histogram)
+    chart_positions = chart.position
+
     return avg_rank_rows, avg_lyric_rows, scatter_rows, chart_positions
 
 
@@ -69,7 +81,7 @@ def get_calculated_data():
 # 
 
 def save_summary_file():
-    avg_rank_rows, avg_lyric_rows, _, _ = get_calculated_data()
+    avg_rank_rows, avg_lyric_rows = get_summary_data()
 
     with open("calculated_results.txt", "w") as f:
         #  Average chart rank 
@@ -91,10 +103,70 @@ def save_summary_file():
     print("Summary file written to calculated_results.txt")
 
 
+# 
+# Summary table consistency check
+# 
+
+def check_summary_tables(tolerance=1e-6):
+    """
+    Compare the summary tables against a full recompute from the base
+    tables (vectorized group-by in analytics).
+    Returns a list of (report, artist, summary value, recomputed value);
+    empty means they agree.
+    """
+    avg_rank_rows, avg_lyric_rows = get_summary_data()
+
+    conn = get_connection(read_only=True)
+    artists = analytics.ArtistDictionary(conn)
+    chart = analytics.load_chart_data(conn, artists)
+    lyrics = analytics.load_lyric_data(conn, artists)
+    conn.close()
+
+    n = len(artists)
+    full_rank = analytics.ranked_groups(
+        artists.names, *analytics.group_mean(chart.artist_code, chart.position, n)
+    )
+    full_length = analytics.ranked_groups(
+        artists.names, *analytics.group_mean(lyrics.artist_code, lyrics.char_count, n)
+    )
+
+    mismatches = []
+    for report, summary_rows, full_rows in [
+        ("avg_rank", avg_rank_rows, full_rank),
+        ("avg_lyric_length", avg_lyric_rows, full_length),
+    ]:
+        fast = dict(summary_rows)
+        full = {name: mean for name, mean, _ in full_rows}
+        for artist in sorted(set(fast) | set(full)):
+            a, b = fast.get(artist), full.get(artist)
+            if a is None or b is None or abs(a - b) > tolerance:
+                mismatches.append((report, artist, a, b))
+
+    return mismatches
+
+
+def rebuild_summaries():
+    conn = get_connection()
+    rebuild_summary_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+    print("Summary tables rebuilt.")
+
+
 # 
 # Run calculations when executed directly
 # 
 
 if __name__ == "__main__":
+    if "--check" in sys.argv:
+        problems = check_summary_tables()
+        for report, artist, fast, full in problems:
+            print(f"MISMATCH {report} for {artist}: summary={fast} recomputed={full}")
+        print("Summary tables OK." if not problems else f"{len(problems)} mismatch(es).")
+        sys.exit(1 if problems else 0)
+
+    if "--rebuild" in sys.argv:
+        rebuild_summaries()
+
     save_summary_file()
     print("Calculations complete.")
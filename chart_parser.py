@@ -0,0 +1,172 @@
+# chart_parser.py
+# Parser backends for Billboard chart pages.
+# Every backend returns the same [(title, artist), ...] list that the
+# original BeautifulSoup code produced:
+#   - "lxml":   lxml.html tree walk (C parser, fastest, optional dependency)
+#   - "stream": stdlib HTMLParser that only buffers text inside the
+#               title <h3> and artist <span class="c-label"> of each row
+#   - "bs4":    the original BeautifulSoup html.parser version (fallback)
+
+#
+# lxml and bs4 are optional and only imported when their backend runs.
+
+import importlib.util
+from html.parser import HTMLParser
+
+ROW_CLASS = "o-chart-results-list__item"
+ARTIST_CLASS = "c-label"
+
+HAVE_LXML = importlib.util.find_spec("lxml") is not None
+
+
+def join_text(strings):
+    """Same as BeautifulSoup get_text(strip=True)."""
+    return "".join(s.strip() for s in strings if s.strip())
+
+
+# ----------------------------------------------------------
+# BeautifulSoup (original)
+# ----------------------------------------------------------
+
+def parse_bs4(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    rows = []
+    for row in soup.select(f"li.{ROW_CLASS}"):
+        title_tag = row.find("h3")
+        artist_tag = row.find("span", class_=ARTIST_CLASS)
+        if not title_tag or not artist_tag:
+            continue
+        rows.append((title_tag.get_text(strip=True), artist_tag.get_text(strip=True)))
+    return rows
+
+
+# ----------------------------------------------------------
+# lxml
+# ----------------------------------------------------------
+
+def has_class(el, name):
+    return name in (el.get("class") or "").split()
+
+
+def parse_lxml(html):
+    import lxml.html
+
+    doc = lxml.html.fromstring(html)
+    rows = []
+    # Element.iter() walks the C tree directly; per-row XPath was the
+    # bottleneck here. itertext() skips comments, like get_text().
+    for row in doc.iter("li"):
+        if not has_class(row, ROW_CLASS):
+            continue
+        title_tag = next(row.iter("h3"), None)
+        artist_tag = next(
+            (s for s in row.iter("span") if has_class(s, ARTIST_CLASS)), None
+        )
+        if title_tag is None or artist_tag is None:
+            continue
+        rows.append((join_text(title_tag.itertext()), join_text(artist_tag.itertext())))
+    return rows
+
+
+# ----------------------------------------------------------
+# Streaming tokenizer (stdlib)
+# ----------------------------------------------------------
+
+class ChartRowParser(HTMLParser):
+    """
+    Tracks open <li> rows; inside a chart row it records the text of the
+    first <h3> and the first <span class="c-label">, ignoring everything else.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.li_stack = []     # one entry per open <li>: row dict or None
+        self.captures = []     # [row, field, tag, depth] currently collecting text
+        self.rows = []         # finished rows, in document order of their <li>
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "li":
+            classes = (dict(attrs).get("class") or "").split()
+            row = None
+            if ROW_CLASS in classes:
+                row = {"title": None, "artist": None}
+                self.rows.append(row)
+            self.li_stack.append(row)
+            return
+
+        for capture in self.captures:
+            if capture[2] == tag:
+                capture[3] += 1
+
+        if tag == "h3":
+            for row in self.open_rows():
+                if row["title"] is None:
+                    row["title"] = []
+                    self.captures.append([row, "title", tag, 1])
+        elif tag == "span":
+            classes = (dict(attrs).get("class") or "").split()
+            if ARTIST_CLASS in classes:
+                for row in self.open_rows():
+                    if row["artist"] is None:
+                        row["artist"] = []
+                        self.captures.append([row, "artist", tag, 1])
+
+    def handle_endtag(self, tag):
+        if tag == "li":
+            if self.li_stack:
+                self.li_stack.pop()
+            return
+
+        for capture in self.captures:
+            if capture[2] == tag:
+                capture[3] -= 1
+        self.captures = [c for c in self.captures if c[3] > 0]
+
+    def handle_data(self, data):
+        for row, field, _, _ in self.captures:
+            row[field].append(data)
+
+    def open_rows(self):
+        return [row for row in self.li_stack if row is not None]
+
+
+def parse_stream(html):
+    parser = ChartRowParser()
+    parser.feed(html)
+    parser.close()
+
+    rows = []
+    for row in parser.rows:
+        if row["title"] is None or row["artist"] is None:
+            continue
+        rows.append((join_text(row["title"]), join_text(row["artist"])))
+    return rows
+
+
+BACKENDS = {
+    "lxml": parse_lxml,
+    "stream": parse_stream,
+    "bs4": parse_bs4,
+}
+
+
+def available_backends():
+    return [name for name in BACKENDS if name != "lxml" or HAVE_LXML]
+
+
+def parse_rows(html, backend="auto"):
+    """
+    [(title, artist)] from a chart page.
+    "auto" uses lxml when installed, else the streaming parser, and falls
+    back to BeautifulSoup if the fast backend finds no rows at all.
+    """
+    if backend != "auto":
+        return BACKENDS[backend](html)
+
+    fast = parse_lxml if HAVE_LXML else parse_stream
+    rows = fast(html)
+    if not rows:
+        rows = parse_bs4(html)
+    return rows
@@ -0,0 +1,83 @@
+# check_fuzzy_match.py
+# Regression check for the fuzzy chart matcher.
+# Chart rows for a near-duplicate of a catalog title (Love / Lover, Hell /
+# Hello, Part 2 / Part 3) must come back unmatched when that sibling is
+# not in the catalog, even with a typo on top; credit/case noise and
+# typos in longer titles must still match. Also runs the synthetic
+# near-duplicate set from bench_fuzzy_match. Exit code 1 on any failure.
+#
+#   python check_fuzzy_match.py [--tracks 20000]
+
+import argparse
+import sys
+
+from bench_fuzzy_match import build
+from fuzzy_matcher import FuzzyMatcher
+
+CATALOG = [
+    (1, "Taylor Swift", "Lover"),
+    (2, "Taylor Swift", "Midnights Part 1"),
+    (3, "Taylor Swift", "Midnights Part 2"),
+    (4, "Adele", "Hello"),
+    (5, "Miley Cyrus", "Flowers"),
+    (6, "The Weeknd", "Blinding Lights"),
+]
+
+# (chart artist, chart title, expected track_id or None)
+CASES = [
+    ("Taylor Swift", "Love", None),
+    ("Taylor Swift", "LOEV!", None),
+    ("Taylor SwiftFeaturingBon Iver", "LOVER!", 1),
+    ("Taylor Swift", "Midnights Part 3", None),
+    ("Taylor Swift", "Midnihgts Part 2", 3),
+    ("Adele", "Hell", None),
+    ("Adele", "Hello.", 4),
+    ("Miley Cyrus", "Flower", None),
+    ("Miley Cyrus", "FLOWERS", 5),
+    ("The Weekend", "Blinding Lihgts", 6),
+]
+
+
+def check_cases():
+    failures = []
+    matcher = FuzzyMatcher(CATALOG)
+    for artist, title, expected in CASES:
+        track_id, confidence = matcher.match(artist, title)
+        if track_id != expected:
+            failures.append(f"{artist!r} / {title!r}: got {track_id} "
+                            f"({confidence:.2f}), expected {expected}")
+
+    # The memo must not hand a lenient answer to a stricter caller.
+    if matcher.match("The Weekend", "Blinding Lihgts", min_confidence=0.99)[0] is not None:
+        failures.append("memoized match ignored a higher min_confidence")
+    return failures
+
+
+def check_near_duplicates(n_tracks):
+    catalog, _, unmatched = build(n_tracks, 0)
+    matcher = FuzzyMatcher(catalog)
+    wrong = [(artist, title) for artist, title in unmatched
+             if matcher.match(artist, title)[0] is not None]
+    return wrong, len(unmatched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that near-duplicate titles don't fuzzy-match.")
+    parser.add_argument("--tracks", type=int, default=20000)
+    args = parser.parse_args()
+
+    failures = check_cases()
+    wrong, total = check_near_duplicates(args.tracks)
+    failures += [f"near-duplicate {artist!r} / {title!r} matched" for artist, title in wrong]
+
+    if not failures:
+        print(f"All {len(CASES)} cases and {total} missing near-duplicates pass.")
+        return 0
+
+    for failure in failures:
+        print("FAIL", failure)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
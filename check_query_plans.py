@@ -0,0 +1,171 @@
+# check_query_plans.py
+# Query-plan regression check.
+# Builds a large synthetic database with the real schema + indexes, runs
+# EXPLAIN QUERY PLAN on every production query and fails (exit code 1) if
+# any of them reads a table with a plain full scan instead of an index.
+#
+#   python check_query_plans.py [--tracks 200000]
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+
+import db_setup
+import analytics
+import analyze_visualize
+import calculations
+import gather_audiodb
+import gather_charts
+import gather_genius
+import gather_lyrics
+import lyrics_search
+import lyrics_store
+from lyric_stats import lyric_stats
+
+# Summary tables hold one row per artist and are meant to be read whole.
+SUMMARY_TABLES = {"artist_rank_summary", "artist_lyrics_summary"}
+
+# (name, sql, example params, tables a full scan is fine for)
+PRODUCTION_QUERIES = [
+    ("gather_charts.charted", gather_charts.CHARTED_SQL,
+     (1, "Billboard Hot 100", "2025-01-01"), set()),
+    ("gather_genius.find_artist", gather_genius.FIND_ARTIST_SQL, ("Artist 1",), set()),
+    ("gather_genius.known_miss", gather_genius.KNOWN_MISS_SQL,
+     ("Artist 1", "Song 1", "2025-01-01T00:00:00"), set()),
+    ("gather_lyrics.due_lyrics", gather_lyrics.DUE_LYRICS_SQL,
+     ("2025-01-01T00:00:00", -1), set()),
+    ("gather_audiodb.missing_audiodb", gather_audiodb.MISSING_AUDIODB_SQL,
+     ("2025-01-01T00:00:00",), set()),
+    ("calculations.avg_rank", calculations.AVG_RANK_SQL, (), SUMMARY_TABLES),
+    ("calculations.avg_lyric_length", calculations.AVG_LYRIC_LENGTH_SQL, (), SUMMARY_TABLES),
+    ("lyrics_store.lyrics_blob", lyrics_store.LYRICS_BLOB_SQL, (1,), set()),
+    # "hits" is the LIMITed FTS5 result, already small.
+    ("lyrics_search.search", lyrics_search.SEARCH_SQL, ("la", 20), {"hits"}),
+    ("lyrics_search.mentions", lyrics_search.MENTIONS_SQL, ("la", 20), {"hits"}),
+    ("lyrics_search.vocab", lyrics_search.VOCAB_SQL, ("la",), set()),
+    ("lyrics_store.indexed", lyrics_store.INDEXED_SQL, (1,), set()),
+    ("analytics.chart_rows", analytics.CHART_ROWS_SQL, (), set()),
+    ("analytics.lyric_rows", analytics.LYRIC_ROWS_SQL, (), set()),
+    ("analyze_visualize.avg_rank_top20", analyze_visualize.AVG_RANK_TOP20_SQL, (),
+     SUMMARY_TABLES),
+    ("analyze_visualize.avg_lyrics_length_top20",
+     analyze_visualize.AVG_LYRICS_LENGTH_TOP20_SQL, (), SUMMARY_TABLES),
+]
+
+# "SCAN tracks" (3.36+) or "SCAN TABLE tracks" (older) with no index after it.
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def build_synthetic_db(path, n_tracks):
+    """Fill a fresh database with n_tracks tracks plus artists, lyrics and charts."""
+    db_setup.DB_NAME = path
+    db_setup.create_tables()
+
+    rng = random.Random(201)
+    n_artists = max(n_tracks // 10, 1)
+    conn = db_setup.get_connection()
+
+    conn.executemany(
+        "INSERT INTO artists (id, name) VALUES (?, ?)",
+        ((i, f"Artist {i}") for i in range(1, n_artists + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO tracks (id, artist_id, title, genre) VALUES (?, ?, ?, ?)",
+        (
+            (i, rng.randint(1, n_artists), f"Song {i}",
+             "Pop" if rng.random() < 0.9 else None)
+            for i in range(1, n_tracks + 1)
+        ),
+    )
+    lyrics = [(i, "la " * rng.randint(50, 400)) for i in range(1, n_tracks + 1, 2)]
+    blobs = {text: lyrics_store.blob_params(text) for _, text in lyrics}
+    conn.executemany(lyrics_store.SAVE_BLOB_SQL, blobs.values())
+    conn.executemany(
+        """
+        INSERT INTO lyrics
+            (track_id, content_hash, char_count, word_count, line_count, unique_word_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        ((i, blobs[text][0]) + lyric_stats(text) for i, text in lyrics),
+    )
+    conn.executemany(lyrics_store.INDEX_LYRICS_SQL, lyrics)
+    conn.execute("DELETE FROM lyrics_retry WHERE track_id IN (SELECT track_id FROM lyrics)")
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO chart_popularity
+            (track_id, chart_name, chart_position, chart_date)
+        VALUES (?, ?, ?, ?)
+        """,
+        (
+            (rng.randint(1, n_tracks), "Billboard Hot 100", pos, f"week-{week}")
+            for week in range(max(n_tracks // 100, 1))
+            for pos in range(1, 101)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def full_scans(conn, sql, params):
+    """Tables the plan reads with a full scan."""
+    plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    details = [row[3] for row in plan]
+    scans = []
+    for detail in details:
+        match = FULL_SCAN.match(detail)
+        if match:
+            scans.append(match.group(1))
+    return scans, details
+
+
+def check_query_plans(n_tracks=200000, verbose=False):
+    """Return a list of (query name, scanned tables, plan) failures."""
+    failures = []
+    original_db = db_setup.DB_NAME
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plans.db")
+        try:
+            build_synthetic_db(path, n_tracks)
+        finally:
+            db_setup.DB_NAME = original_db
+
+        conn = db_setup.get_connection(db_name=path)
+        for name, sql, params, allowed in PRODUCTION_QUERIES:
+            scans, details = full_scans(conn, sql, params)
+            scans = [table for table in scans if table not in allowed]
+            if verbose:
+                print(name)
+                for detail in details:
+                    print("    ", detail)
+            if scans:
+                failures.append((name, scans, details))
+        conn.close()
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that production queries use indexes.")
+    parser.add_argument("--tracks", type=int, default=200000)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    failures = check_query_plans(args.tracks, args.verbose)
+
+    if not failures:
+        print(f"All {len(PRODUCTION_QUERIES)} production queries use indexes.")
+        return 0
+
+    for name, scans, details in failures:
+        print(f"FULL SCAN in {name}: {', '.join(scans)}")
+        for detail in details:
+            print("    ", detail)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,437 @@
+import re
 import sqlite3
 
+import pipeline_log
+from lyric_stats import backfill_lyric_stats
+from lyrics_store import index_lyrics, migrate_lyrics_text
+
 DB_NAME = "music_project.db"
 
+log = pipeline_log.get_logger("db_setup")
+
+BUSY_TIMEOUT_MS = 10000          # wait this long for a lock instead of failing
+CACHE_SIZE_KB = 64 * 1024        # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024    # memory-map up to this much of the file
+
+# Pragmas applied to every connection; journal_mode=WAL is set once by the
+# read-write profile and then sticks to the database file.
+COMMON_PRAGMAS = [
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+]
+# Tokenizer for the lyrics_fts full-text index (create_lyrics_fts). "trigram"
+# also matches substrings inside words; the index is rebuilt on a change.
+LYRICS_FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+READ_WRITE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",   # safe with WAL, far fewer fsyncs than FULL
+]
+
+
+def get_connection(read_only=False, db_name=None, check_same_thread=True):
+    """
+    Open the project database with WAL and tuned pragmas.
+    read_only=True opens the file with mode=ro for analysis code, so readers
+    never take write locks; the default profile is read-write.
+    """
+    db_name = db_name or DB_NAME
+
+    if read_only:
+        conn = sqlite3.connect(
+            f"file:{db_name}?mode=ro",
+            uri=True,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=check_same_thread,
+        )
+    else:
+        conn = sqlite3.connect(
+            db_name,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=check_same_thread,
+        )
+        for pragma in READ_WRITE_PRAGMAS:
+            conn.execute(pragma)
+
+    for pragma in COMMON_PRAGMAS:
+        conn.execute(pragma)
+
+    return conn
+
+
+def column_exists(cur, table, column):
+    cur.execute(f"PRAGMA table_info({table})")
+    return column in {row[1] for row in cur.fetchall()}
+
+
+def add_column_if_missing(cur, table, column, decl):
+    """ALTER TABLE for databases created before a column existed."""
+    if not column_exists(cur, table, column):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def create_indexes(cur):
+    """Indexes for the hot lookups (see check_query_plans.py)."""
+
+    # artists.name and tracks(artist_id, title) are already covered by
+    # their UNIQUE constraints (gather_genius looks artists up by name).
+
+    # calculations / analyze_visualize: join on track_id and aggregate
+    # chart_position straight from the index.
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chart_popularity_track_position
+        ON chart_popularity(track_id, chart_position)
+    """)
+
+    # Histogram of chart positions.
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_chart_popularity_position
+        ON chart_popularity(chart_position)
+    """)
+
+    # Nothing looks tracks up by Genius song id; covers of a song can share
+    # one, so it is stored but not indexed.
+    cur.execute("DROP INDEX IF EXISTS idx_tracks_genius_song")
+
+    # gather_audiodb.get_tracks_missing_audiodb: only rows still missing data.
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tracks_missing_audiodb
+        ON tracks(id)
+        WHERE genre IS NULL OR bpm IS NULL OR album_name IS NULL
+    """)
+
+    # gather_lyrics.get_tracks_missing_lyrics: tracks due for a lyrics
+    # attempt, oldest first; given-up rows (NULL) aren't indexed.
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lyrics_retry_due
+        ON lyrics_retry(next_attempt_at)
+        WHERE next_attempt_at IS NOT NULL
+    """)
+
+    # Blob cleanup triggers: is any other lyrics row still using this text?
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lyrics_content_hash
+        ON lyrics(content_hash)
+        WHERE content_hash IS NOT NULL
+    """)
+
+    # Lyric statistics, covering for the reports; skips rows without
+    # stats. Replaces the old LENGTH() index.
+    cur.execute("DROP INDEX IF EXISTS idx_lyrics_length")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lyrics_stats
+        ON lyrics(track_id, char_count, word_count, line_count, unique_word_count)
+        WHERE char_count IS NOT NULL
+    """)
+
+
+def table_exists(cur, name):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cur.fetchone() is not None
+
+
+def rebuild_summary_tables(cur):
+    """Recompute both per-artist summary tables from scratch."""
+    cur.execute("DELETE FROM artist_rank_summary")
+    cur.execute("""
+        INSERT INTO artist_rank_summary (artist_id, rank_sum, rank_count)
+        SELECT tracks.artist_id, SUM(chart_popularity.chart_position), COUNT(*)
+        FROM chart_popularity
+        JOIN tracks ON tracks.id = chart_popularity.track_id
+        GROUP BY tracks.artist_id
+    """)
+
+    cur.execute("DELETE FROM artist_lyrics_summary")
+    cur.execute("""
+        INSERT INTO artist_lyrics_summary (artist_id, length_sum, lyrics_count)
+        SELECT tracks.artist_id, SUM(lyrics.char_count), COUNT(*)
+        FROM lyrics
+        JOIN tracks ON tracks.id = lyrics.track_id
+        WHERE lyrics.char_count IS NOT NULL
+        GROUP BY tracks.artist_id
+    """)
+
+
+def create_summary_tables(cur):
+    """
+    Per-artist running totals kept current by triggers, so the average
+    rank / lyric length reports never re-aggregate the big tables.
+    Filled from the existing data the first time they're created.
+    Triggers are dropped and recreated so older databases pick up changes.
+    """
+    is_new = not table_exists(cur, "artist_rank_summary")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS artist_rank_summary (
+            artist_id INTEGER PRIMARY KEY,
+            rank_sum INTEGER NOT NULL,
+            rank_count INTEGER NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS artist_lyrics_summary (
+            artist_id INTEGER PRIMARY KEY,
+            length_sum INTEGER NOT NULL,
+            lyrics_count INTEGER NOT NULL
+        )
+    """)
+
+    # chart_popularity -> artist_rank_summary
+    cur.execute("DROP TRIGGER IF EXISTS trg_chart_popularity_insert_summary")
+    cur.execute("""
+        CREATE TRIGGER trg_chart_popularity_insert_summary
+        AFTER INSERT ON chart_popularity
+        BEGIN
+            INSERT INTO artist_rank_summary (artist_id, rank_sum, rank_count)
+            SELECT artist_id, NEW.chart_position, 1 FROM tracks WHERE id = NEW.track_id
+            ON CONFLICT(artist_id) DO UPDATE SET
+                rank_sum = rank_sum + excluded.rank_sum,
+                rank_count = rank_count + 1;
+        END
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS trg_chart_popularity_delete_summary")
+    cur.execute("""
+        CREATE TRIGGER trg_chart_popularity_delete_summary
+        AFTER DELETE ON chart_popularity
+        BEGIN
+            UPDATE artist_rank_summary
+            SET rank_sum = rank_sum - OLD.chart_position,
+                rank_count = rank_count - 1
+            WHERE artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id);
+            DELETE FROM artist_rank_summary
+            WHERE artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id)
+              AND rank_count <= 0;
+        END
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS trg_chart_popularity_update_summary")
+    cur.execute("""
+        CREATE TRIGGER trg_chart_popularity_update_summary
+        AFTER UPDATE OF track_id, chart_position ON chart_popularity
+        BEGIN
+            UPDATE artist_rank_summary
+            SET rank_sum = rank_sum - OLD.chart_position,
+                rank_count = rank_count - 1
+            WHERE artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id);
+            INSERT INTO artist_rank_summary (artist_id, rank_sum, rank_count)
+            SELECT artist_id, NEW.chart_position, 1 FROM tracks WHERE id = NEW.track_id
+            ON CONFLICT(artist_id) DO UPDATE SET
+                rank_sum = rank_sum + excluded.rank_sum,
+                rank_count = rank_count + 1;
+            DELETE FROM artist_rank_summary
+            WHERE artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id)
+              AND rank_count <= 0;
+        END
+    """)
+
+    # lyrics -> artist_lyrics_summary, using the char_count stored at save
+    # time (NULL "not found" rows don't count).
+    # Writers must upsert rather than INSERT OR REPLACE: REPLACE's implicit
+    # delete doesn't fire the delete trigger.
+    cur.execute("DROP TRIGGER IF EXISTS trg_lyrics_insert_summary")
+    cur.execute("""
+        CREATE TRIGGER trg_lyrics_insert_summary
+        AFTER INSERT ON lyrics
+        WHEN NEW.char_count IS NOT NULL
+        BEGIN
+            INSERT INTO artist_lyrics_summary (artist_id, length_sum, lyrics_count)
+            SELECT artist_id, NEW.char_count, 1 FROM tracks WHERE id = NEW.track_id
+            ON CONFLICT(artist_id) DO UPDATE SET
+                length_sum = length_sum + excluded.length_sum,
+                lyrics_count = lyrics_count + 1;
+        END
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS trg_lyrics_delete_summary")
+    cur.execute("""
+        CREATE TRIGGER trg_lyrics_delete_summary
+        AFTER DELETE ON lyrics
+        WHEN OLD.char_count IS NOT NULL
+        BEGIN
+            UPDATE artist_lyrics_summary
+            SET length_sum = length_sum - OLD.char_count,
+                lyrics_count = lyrics_count - 1
+            WHERE artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id);
+            DELETE FROM artist_lyrics_summary
+            WHERE artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id)
+              AND lyrics_count <= 0;
+        END
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS trg_lyrics_update_summary")
+    cur.execute("""
+        CREATE TRIGGER trg_lyrics_update_summary
+        AFTER UPDATE OF char_count ON lyrics
+        BEGIN
+            UPDATE artist_lyrics_summary
+            SET length_sum = length_sum - OLD.char_count,
+                lyrics_count = lyrics_count - 1
+            WHERE OLD.char_count IS NOT NULL
+              AND artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id);
+            INSERT INTO artist_lyrics_summary (artist_id, length_sum, lyrics_count)
+            SELECT artist_id, NEW.char_count, 1 FROM tracks
+            WHERE id = NEW.track_id AND NEW.char_count IS NOT NULL
+            ON CONFLICT(artist_id) DO UPDATE SET
+                length_sum = length_sum + excluded.length_sum,
+                lyrics_count = lyrics_count + 1;
+            DELETE FROM artist_lyrics_summary
+            WHERE artist_id = (SELECT artist_id FROM tracks WHERE id = OLD.track_id)
+              AND lyrics_count <= 0;
+        END
+    """)
+
+    if is_new:
+        rebuild_summary_tables(cur)
+
+
+def create_checkpoint_table(cur):
+    """run_pipeline's per-stage completion checkpoints (stage_scheduler.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_checkpoints (
+            stage TEXT PRIMARY KEY,
+            completed_at TEXT
+        )
+    """)
+
+
+def create_lyrics_retry_table(cur):
+    """
+    Lyrics work queue and retry state (gather_lyrics.py): one row per track
+    still without lyrics, with the attempts so far (and how many of them
+    were "not found"), the last error and when the track is due again
+    (NULL = given up). New tracks get a due row from
+    a trigger. Replaces the old NULL "not found" rows in lyrics, which are
+    moved here once so those tracks are retried.
+    """
+    is_new = not table_exists(cur, "lyrics_retry")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS lyrics_retry (
+            track_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            not_found_attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (track_id) REFERENCES tracks(id)
+        )
+    """)
+    if not column_exists(cur, "lyrics_retry", "not_found_attempts"):
+        # Older rows only kept the total; count a last "not found" once.
+        add_column_if_missing(cur, "lyrics_retry", "not_found_attempts",
+                              "INTEGER NOT NULL DEFAULT 0")
+        cur.execute("UPDATE lyrics_retry SET not_found_attempts = 1 WHERE last_error = 'not_found'")
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_tracks_insert_lyrics_retry
+        AFTER INSERT ON tracks
+        BEGIN
+            INSERT OR IGNORE INTO lyrics_retry (track_id, next_attempt_at)
+            VALUES (NEW.id, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'));
+        END
+    """)
+
+    if is_new:
+        now = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+        moved = 0
+        if column_exists(cur, "lyrics", "lyrics_text"):
+            cur.execute(f"""
+                INSERT OR IGNORE INTO lyrics_retry
+                    (track_id, attempts, last_error, next_attempt_at, updated_at)
+                SELECT track_id, 1, 'unknown', {now}, {now}
+                FROM lyrics WHERE lyrics_text IS NULL
+            """)
+            moved = cur.rowcount
+            cur.execute("DELETE FROM lyrics WHERE lyrics_text IS NULL")
+        cur.execute(f"""
+            INSERT OR IGNORE INTO lyrics_retry (track_id, next_attempt_at)
+            SELECT id, {now} FROM tracks
+            WHERE id NOT IN (SELECT track_id FROM lyrics)
+        """)
+        log.info("lyrics_retry_migrated", placeholders=moved, queued=cur.rowcount)
+
+
+def fts_tokenizer(sql):
+    """The tokenize= option of a CREATE VIRTUAL TABLE statement, or None."""
+    match = re.search(r"tokenize='([^']*)'", sql)
+    return match.group(1) if match else None
+
+
+def create_lyrics_fts(cur, tokenizer=None, rebuild=False):
+    """
+    Full-text index over lyrics (lyrics_search.py). Contentless: the text
+    already lives compressed in lyrics_blobs, so the index keeps no copy.
+    SQLite can't decompress blobs, so rows are added and taken out in
+    Python on the save path (lyrics_store.index_statements); lyrics
+    written by any other client stay unindexed until a rebuild.
+    An existing index keeps its tokenizer; rebuild=True (lyrics_search
+    --rebuild) recreates it with `tokenizer`. A new index, or the earlier
+    full-content one, is filled from existing lyrics.
+    No prefix= indexes: "term*" queries stay in milliseconds without them,
+    and they made indexing about 3x slower.
+    """
+    # Triggers of earlier versions: a Python function, then plain-SQL
+    # deletes, which a contentless table rejects.
+    for name in ("trg_lyrics_fts_insert", "trg_lyrics_fts_update_old", "trg_lyrics_fts_update_new",
+                 "trg_lyrics_fts_delete", "trg_lyrics_fts_update"):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    cur.execute("SELECT sql FROM sqlite_master WHERE name = 'lyrics_fts'")
+    row = cur.fetchone()
+    tokenizer = tokenizer or (row and fts_tokenizer(row[0])) or LYRICS_FTS_TOKENIZER
+    if row and (rebuild or "content=''" not in row[0]):
+        cur.execute("DROP TABLE lyrics_fts")
+        row = None
+
+    if row is None:
+        cur.execute(f"""
+            CREATE VIRTUAL TABLE lyrics_fts USING fts5(
+                lyrics, content='', tokenize='{tokenizer}'
+            )
+        """)
+        log.info("lyrics_fts_built", rows=index_lyrics(cur), tokenizer=tokenizer)
+
+    # term -> documents / occurrences, for lyrics_search.document_frequency
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS lyrics_fts_vocab
+        USING fts5vocab(lyrics_fts, row)
+    """)
+
+
+def create_genius_miss_table(cur):
+    """Searches Genius had no hits for, so reruns don't repeat them (gather_genius.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS genius_misses (
+            artist TEXT NOT NULL,
+            title TEXT NOT NULL,
+            searched_at TEXT NOT NULL,
+            PRIMARY KEY (artist, title)
+        )
+    """)
+
+
+def create_audiodb_miss_table(cur):
+    """Tracks AudioDB left incomplete, so reruns don't ask again (gather_audiodb.py)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS audiodb_misses (
+            track_id INTEGER PRIMARY KEY,
+            searched_at TEXT NOT NULL,
+            FOREIGN KEY (track_id) REFERENCES tracks(id)
+        )
+    """)
+
 
 def create_tables():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection()
     cur = conn.cursor()
 
     # Artists
     cur.execute("""
         CREATE TABLE IF NOT EXISTS artists (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE
+            name TEXT UNIQUE,
+            genius_artist_id INTEGER
         )
     """)
+    add_column_if_missing(cur, "artists", "genius_artist_id", "INTEGER")
 
     # Tracks
     cur.execute("""
@@ -21,19 +439,82 @@ def create_tables():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             artist_id INTEGER,
             title TEXT,
+            genre TEXT,
+            mood TEXT,
+            bpm INTEGER,
+            album_name TEXT,
+            album_thumb TEXT,
+            genius_song_id INTEGER,
+            genius_url TEXT,
             UNIQUE(artist_id, title),
             FOREIGN KEY (artist_id) REFERENCES artists(id)
         )
     """)
 
+    # AudioDB metadata columns (older databases don't have them yet)
+    add_column_if_missing(cur, "tracks", "genre", "TEXT")
+    add_column_if_missing(cur, "tracks", "mood", "TEXT")
+    add_column_if_missing(cur, "tracks", "bpm", "INTEGER")
+    add_column_if_missing(cur, "tracks", "album_name", "TEXT")
+    add_column_if_missing(cur, "tracks", "album_thumb", "TEXT")
+
+    # Genius ids (gather_genius.py); NULL for tracks added before they were kept
+    add_column_if_missing(cur, "tracks", "genius_song_id", "INTEGER")
+    add_column_if_missing(cur, "tracks", "genius_url", "TEXT")
+
+    # Distinct lyrics texts, compressed (lyrics_store.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS lyrics_blobs (
+            content_hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            body BLOB NOT NULL,
+            raw_size INTEGER
+        )
+    """)
+
     # Lyrics
     cur.execute("""
         CREATE TABLE IF NOT EXISTS lyrics (
             track_id INTEGER PRIMARY KEY,
-            lyrics_text TEXT,
-            FOREIGN KEY (track_id) REFERENCES tracks(id)
+            content_hash TEXT,
+            char_count INTEGER,
+            word_count INTEGER,
+            line_count INTEGER,
+            unique_word_count INTEGER,
+            FOREIGN KEY (track_id) REFERENCES tracks(id),
+            FOREIGN KEY (content_hash) REFERENCES lyrics_blobs(content_hash)
         )
     """)
+    add_column_if_missing(cur, "lyrics", "content_hash",
+                          "TEXT REFERENCES lyrics_blobs(content_hash)")
+
+    # A blob goes away with the last lyrics row pointing at it.
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_lyrics_delete_blob
+        AFTER DELETE ON lyrics
+        WHEN OLD.content_hash IS NOT NULL
+        BEGIN
+            DELETE FROM lyrics_blobs
+            WHERE content_hash = OLD.content_hash
+              AND NOT EXISTS (SELECT 1 FROM lyrics WHERE content_hash = OLD.content_hash);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_lyrics_update_blob
+        AFTER UPDATE OF content_hash ON lyrics
+        WHEN OLD.content_hash IS NOT NULL AND OLD.content_hash IS NOT NEW.content_hash
+        BEGIN
+            DELETE FROM lyrics_blobs
+            WHERE content_hash = OLD.content_hash
+              AND NOT EXISTS (SELECT 1 FROM lyrics WHERE content_hash = OLD.content_hash);
+        END
+    """)
+
+    # Lyric statistics (lyric_stats.py), filled in by save_lyrics
+    add_column_if_missing(cur, "lyrics", "char_count", "INTEGER")
+    add_column_if_missing(cur, "lyrics", "word_count", "INTEGER")
+    add_column_if_missing(cur, "lyrics", "line_count", "INTEGER")
+    add_column_if_missing(cur, "lyrics", "unique_word_count", "INTEGER")
 
     # Charts (normalized chart names + dates)
     cur.execute("""
@@ -66,15 +547,70 @@ def create_tables():
             chart_name TEXT NOT NULL,
             chart_position INTEGER NOT NULL,
             chart_date TEXT NOT NULL,
+            match_confidence REAL DEFAULT 1.0,
             UNIQUE(track_id, chart_name, chart_date),
             FOREIGN KEY (track_id) REFERENCES tracks(id)
         )
     """)
 
+    # Cursor for gather_charts.backfill_charts: one row per finished chart date
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS chart_backfill_progress (
+            chart_name TEXT NOT NULL,
+            chart_date TEXT NOT NULL,
+            entries INTEGER,
+            matched INTEGER,
+            completed_at TEXT,
+            PRIMARY KEY (chart_name, chart_date)
+        )
+    """)
+
+    # ingest_archive.py: saved chart pages already ingested, by content hash
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS chart_archive_files (
+            content_hash TEXT PRIMARY KEY,
+            path TEXT,
+            chart_date TEXT,
+            entries INTEGER,
+            matched INTEGER,
+            ingested_at TEXT
+        )
+    """)
+
+    create_checkpoint_table(cur)
+    create_genius_miss_table(cur)
+    create_audiodb_miss_table(cur)
+    create_lyrics_retry_table(cur)
+
+    # 1.0 = exact match, lower = fuzzy match score (fuzzy_matcher.py)
+    add_column_if_missing(cur, "chart_popularity", "match_confidence", "REAL DEFAULT 1.0")
+
+    create_indexes(cur)
+    create_summary_tables(cur)
+
+    # Databases from before lyrics_blobs still keep the raw lyrics_text.
+    migrated = 0
+    if column_exists(cur, "lyrics", "lyrics_text"):
+        # One-shot backfill of lyric stats for rows saved before the columns
+        # existed. Their lengths were summed by the old LENGTH() triggers, so
+        # the summaries are recomputed once afterwards.
+        if backfill_lyric_stats(cur):
+            rebuild_summary_tables(cur)
+
+        # Then move the text into compressed, deduplicated blobs.
+        migrated = migrate_lyrics_text(cur)
+        log.info("lyrics_blobs_migrated", rows=migrated)
+
+    # After the blob migration, so existing lyrics are indexed from blobs.
+    create_lyrics_fts(cur)
+
     conn.commit()
+    if migrated:
+        conn.execute("VACUUM")   # hand the space of the raw text back to the OS
     conn.close()
-    print("Tables created successfully.")
+    log.info("tables_created", db=DB_NAME)
 
 
 if __name__ == "__main__":
+    pipeline_log.configure()
     create_tables()
@@ -0,0 +1,121 @@
+# db_writer.py
+# One connection per ingestion stage that buffers rows and writes them in
+# batches (executemany + a single commit) instead of connect/commit/close
+# for every track.
+
+import threading
+import time
+
+import metrics
+from db_setup import get_connection
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_SECONDS = 2.0
+
+metrics.describe("db_rows_written_total", "Rows written to music_project.db, by writer.")
+metrics.describe("db_commit_seconds", "Time spent committing a batch.")
+metrics.describe("db_rollbacks_total", "Batches rolled back after an error.")
+
+
+class BatchWriter:
+    """
+    Usage:
+        with BatchWriter() as writer:
+            writer.add("INSERT ... VALUES (?, ?)", (a, b))
+
+    add() buffers a row; rows are flushed with executemany and committed
+    once the buffer reaches batch_size or flush_seconds have passed.
+    execute() runs a statement right away (for inserts whose id is needed)
+    and commits with the next batch.
+
+    Leaving the with-block normally, or through Ctrl-C, flushes everything
+    that was buffered. Any other exception rolls the open batch back, so
+    the database never holds half of a batch.
+    """
+
+    def __init__(self, db_name=None, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS, name="default"):
+        self.conn = get_connection(db_name=db_name, check_same_thread=False)
+        self.name = name           # "writer" label on the db_* metrics
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.pending = []          # runs of [sql, [params, ...]] in add() order
+        self.pending_count = 0
+        self.uncommitted = 0       # statements run via execute() since commit
+        self.last_flush = time.monotonic()
+        self.rows_written = 0
+        self.lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None or issubclass(exc_type, KeyboardInterrupt):
+            self.close()
+        else:
+            self.discard()
+            self.conn.close()
+        return False
+
+    def add(self, sql, params):
+        with self.lock:
+            if not self.pending or self.pending[-1][0] != sql:
+                self.pending.append([sql, []])
+            self.pending[-1][1].append(tuple(params))
+            self.pending_count += 1
+            self.maybe_flush()
+
+    def execute(self, sql, params=()):
+        """Run a statement now on the writer's connection; commit comes later."""
+        with self.lock:
+            cur = self.conn.execute(sql, params)
+            self.note_write()
+            return cur
+
+    def note_write(self, count=1):
+        """Count writes made directly on writer.conn toward the next commit."""
+        with self.lock:
+            self.uncommitted += count
+            self.maybe_flush()
+
+    def maybe_flush(self):
+        due = time.monotonic() - self.last_flush >= self.flush_seconds
+        if self.pending_count + self.uncommitted >= self.batch_size or due:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered row and commit them as one transaction."""
+        with self.lock:
+            if self.pending_count or self.uncommitted:
+                start = time.perf_counter()
+                try:
+                    for sql, rows in self.pending:
+                        self.conn.executemany(sql, rows)
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    metrics.inc("db_rollbacks_total", writer=self.name)
+                    raise
+                written = self.pending_count + self.uncommitted
+                self.rows_written += written
+                metrics.observe("db_commit_seconds", time.perf_counter() - start, writer=self.name)
+                metrics.inc("db_rows_written_total", written, writer=self.name)
+
+            self.pending.clear()
+            self.pending_count = 0
+            self.uncommitted = 0
+            self.last_flush = time.monotonic()
+
+    def discard(self):
+        """Drop buffered rows and roll back anything not yet committed."""
+        with self.lock:
+            self.pending.clear()
+            self.pending_count = 0
+            self.uncommitted = 0
+            self.conn.rollback()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.conn.commit()
+            self.conn.close()
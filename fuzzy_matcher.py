@@ -0,0 +1,187 @@
+# fuzzy_matcher.py
+# Fuzzy fallback for chart rows the exact TrackIndex can't match.
+# Titles are blocked with a trigram inverted index, so each chart row is
+# only scored against the few tracks sharing its rarest trigrams instead
+# of the whole catalog. Candidates are narrowed by trigram overlap, the
+# best few are scored with difflib similarity on title and artist, and the
+# score is kept as the match confidence.
+# A matching artist can't carry a weak title: the title alone has to pass
+# MIN_TITLE_SIMILARITY and must not look like a different song (Part 1 /
+# Part 2, Love / Lover), and if another title scores about as well there
+# is no match.
+
+from collections import Counter
+from difflib import SequenceMatcher
+
+from track_matcher import artist_keys, normalize_key
+
+MIN_CONFIDENCE = 0.85     # below this a candidate is not accepted
+MIN_TITLE_SIMILARITY = 0.9  # ...and neither is a title less similar than this
+AMBIGUITY_MARGIN = 0.05   # a runner-up title this close = ambiguous
+TITLE_WEIGHT = 0.7
+ARTIST_WEIGHT = 0.3
+
+RARE_TRIGRAMS = 6         # only the rarest trigrams of a title are looked up
+MAX_POSTINGS = 5000       # trigrams in more titles than this are too common to block on
+MAX_CANDIDATES = 25       # candidates pulled from the blocking index per chart row
+SCORED_CANDIDATES = 5     # of those, how many get the (slow) difflib score
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(grams_a, grams_b):
+    """Trigram overlap, a cheap stand-in for similarity() when ranking."""
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def similarity(a, b):
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def numbers(title_key):
+    return {word for word in title_key.split() if word.isdigit()}
+
+
+def different_song(title_a, title_b):
+    """
+    Titles a typo wouldn't explain: different numbers (part 1 / part 2),
+    or one title is the other with letters added (love / lover, hell /
+    hello, midnight / midnights). Letters are compared as counts, so a
+    swapped pair on top ("outisder") still reads as a different song.
+    """
+    if numbers(title_a) != numbers(title_b):
+        return True
+    letters_a = Counter(title_a.replace(" ", ""))
+    letters_b = Counter(title_b.replace(" ", ""))
+    return letters_a != letters_b and (letters_a <= letters_b or letters_b <= letters_a)
+
+
+def score_pair(artist_keys_a, title_a, artist_keys_b, title_b):
+    """(weighted title + best artist-credit similarity, title similarity), 0..1."""
+    title_score = similarity(title_a, title_b)
+    if set(artist_keys_a) & set(artist_keys_b):
+        artist_score = 1.0
+    else:
+        artist_score = max(
+            (similarity(a, b) for a in artist_keys_a for b in artist_keys_b),
+            default=0.0,
+        )
+    return TITLE_WEIGHT * title_score + ARTIST_WEIGHT * artist_score, title_score
+
+
+class FuzzyMatcher:
+    """
+    Build once from (track_id, artist, title) rows, then call match().
+    Results are memoized per normalized (artist, title) and min_confidence,
+    since the same songs show up on chart after chart.
+    """
+
+    def __init__(self, rows=()):
+        self.track_ids = []
+        self.titles = []
+        self.artists = []
+        self.postings = {}
+        self.by_artist = {}
+        self.memo = {}
+        for track_id, artist, title in rows:
+            self.add(track_id, artist, title)
+
+    def add(self, track_id, artist, title):
+        title_key = normalize_key(title)
+        if not title_key:
+            return
+        pos = len(self.track_ids)
+        self.track_ids.append(track_id)
+        self.titles.append(title_key)
+        self.artists.append(artist_keys(artist))
+        for gram in trigrams(title_key):
+            self.postings.setdefault(gram, []).append(pos)
+        for key in self.artists[pos]:
+            self.by_artist.setdefault(key, []).append(pos)
+        self.memo.clear()
+
+    def candidates(self, title_key, keys=()):
+        """
+        Positions of the catalog titles most like title_key: block on the
+        rarest trigrams, then keep the best few by full trigram overlap.
+        The closest titles by the credited artists are always included, so
+        a same-artist near-duplicate can't be missed.
+        """
+        title_grams = trigrams(title_key)
+        grams = [g for g in title_grams if g in self.postings]
+        if not grams:
+            return []
+
+        grams.sort(key=lambda g: len(self.postings[g]))
+        usable = [g for g in grams if len(self.postings[g]) <= MAX_POSTINGS]
+        blocks = (usable or grams[:1])[:RARE_TRIGRAMS]
+
+        counts = Counter()
+        for gram in blocks:
+            counts.update(self.postings[gram])
+        blocked = [pos for pos, _ in counts.most_common(MAX_CANDIDATES)]
+
+        def overlap(pos):
+            return dice(title_grams, trigrams(self.titles[pos]))
+
+        blocked.sort(key=overlap, reverse=True)
+        same_artist = {pos for key in keys for pos in self.by_artist.get(key, ())}
+        closest = sorted(same_artist, key=overlap, reverse=True)[:SCORED_CANDIDATES]
+        return list(dict.fromkeys(blocked[:SCORED_CANDIDATES] + closest))
+
+    def best(self, keys, title_key, positions, min_confidence):
+        """
+        Highest-scoring position as (track_id, confidence), or (None, 0.0)
+        when its title alone fails the checks or the runner-up (another
+        title the row could be a typo of, by any artist) scores within
+        AMBIGUITY_MARGIN of it.
+        """
+        scored = []
+        for pos in positions:
+            score, title_score = score_pair(keys, title_key, self.artists[pos], self.titles[pos])
+            scored.append((score, title_score, pos))
+        if not scored:
+            return None, 0.0
+
+        score, title_score, pos = max(scored)
+        if (score < min_confidence
+                or title_score < MIN_TITLE_SIMILARITY
+                or different_song(title_key, self.titles[pos])):
+            return None, 0.0
+
+        # Siblings that are plainly another song (Part 3 for a Part 4 row)
+        # can't make the match ambiguous.
+        runner_up = max(
+            (other_score for other_score, _, other in scored
+             if self.titles[other] != self.titles[pos]
+             and not different_song(title_key, self.titles[other])),
+            default=0.0,
+        )
+        if runner_up >= score - AMBIGUITY_MARGIN:
+            return None, 0.0
+        return self.track_ids[pos], score
+
+    def match(self, artist, title, min_confidence=MIN_CONFIDENCE):
+        """Return (track_id, confidence) for the best candidate, or (None, 0.0)."""
+        title_key = normalize_key(title)
+        keys = artist_keys(artist)
+        memo_key = (tuple(keys), title_key, min_confidence)
+        if memo_key in self.memo:
+            return self.memo[memo_key]
+
+        result = self.best(keys, title_key, self.candidates(title_key, keys), min_confidence)
+        self.memo[memo_key] = result
+        return result
+
+    def match_brute_force(self, artist, title, min_confidence=MIN_CONFIDENCE):
+        """Score against every track; only used as the benchmark baseline."""
+        title_key = normalize_key(title)
+        keys = artist_keys(artist)
+        return self.best(keys, title_key, range(len(self.track_ids)), min_confidence)
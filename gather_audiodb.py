@@ -1,9 +1,23 @@
 # gather_audiodb.py
-import sqlite3
+# Lookups that leave a track without genre, BPM or album are remembered in
+# audiodb_misses, so the next runs don't ask AudioDB again right away.
+import datetime
 import re
-from db_setup import DB_NAME
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+import pipeline_log
+from db_setup import get_connection
+from db_writer import BatchWriter
 from theaudiodb_api import get_track_details
 
+AUDIODB_TRACK_WORKERS = 8     # tracks looked up at the same time
+AUDIODB_MAX_IN_FLIGHT = 16    # global cap on concurrent AudioDB requests
+AUDIODB_MISS_TTL_DAYS = 30    # incomplete lookups are retried after this long
+
+log = pipeline_log.get_logger("gather_audiodb")
+
+metrics.describe("audiodb_results_total", "AudioDB lookups, found or missing.")
+
 
 # ----------------------------------------------------------
 # Title Normalization Helpers
@@ -43,44 +57,126 @@ def clean_title_for_audiodb(title):
     return t
 
 
+def build_title_attempts(title):
+    """Title variants to try, in priority order."""
+    attempts = []
+
+    # 1. Exact title
+    attempts.append(title)
+
+    # 2. Cleaned title (remove featuring + punctuation)
+    cleaned = clean_title_for_audiodb(title)
+    if cleaned not in attempts:
+        attempts.append(cleaned)
+
+    # 3. Remove apostrophes
+    no_apostrophes = cleaned.replace("'", "")
+    if no_apostrophes not in attempts:
+        attempts.append(no_apostrophes)
+
+    # 4. Remove trailing apostrophe slang (Darlin' → Darlin)
+    if cleaned.endswith("'"):
+        attempts.append(cleaned[:-1])
+
+    # Remove duplicates while keeping order
+    seen = set()
+    return [x for x in attempts if not (x in seen or seen.add(x))]
+
+
+def lookup_track(title, request_pool=None):
+    """
+    Find AudioDB info for a title, trying every variant.
+    The first variant is always sent on its own, since it usually matches.
+    If it misses and there is a request_pool, the remaining variants are
+    sent at once and the first match in priority order wins; variants that
+    haven't started are cancelled and the rest are ignored. Without a pool
+    they're tried one by one.
+    """
+    attempts = build_title_attempts(title)
+
+    if request_pool is None or len(attempts) <= 2:
+        for attempt in attempts:
+            log.debug("audiodb_try_title", title=attempt)
+            info = get_track_details(attempt)
+            if info:
+                return info
+        return None
+
+    log.debug("audiodb_try_title", title=attempts[0])
+    info = get_track_details(attempts[0])
+    if info:
+        return info
+
+    futures = [request_pool.submit(get_track_details, a) for a in attempts[1:]]
+    try:
+        for future in futures:
+            info = future.result()
+            if info:
+                return info
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+
+
 # ----------------------------------------------------------
 # Database Helpers
 # ----------------------------------------------------------
 
+# Matches the WHERE of idx_tracks_missing_audiodb so the partial index is
+# used; tracks looked up within AUDIODB_MISS_TTL_DAYS are skipped.
+MISSING_AUDIODB_SQL = """
+    SELECT id, title
+    FROM tracks
+    WHERE (genre IS NULL
+           OR bpm IS NULL
+           OR album_name IS NULL)
+      AND NOT EXISTS (
+          SELECT 1 FROM audiodb_misses
+          WHERE audiodb_misses.track_id = tracks.id AND searched_at >= ?
+      );
+"""
+RECORD_MISS_SQL = """
+    INSERT OR REPLACE INTO audiodb_misses (track_id, searched_at) VALUES (?, ?)
+"""
+
+
 def get_tracks_missing_audiodb():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection(read_only=True)
     cur = conn.cursor()
 
-    cur.execute("""
-        SELECT id, title
-        FROM tracks
-        WHERE genre IS NULL
-           OR bpm IS NULL
-           OR album_name IS NULL;
-    """)
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=AUDIODB_MISS_TTL_DAYS)
+    cur.execute(MISSING_AUDIODB_SQL, (cutoff.isoformat(timespec="seconds"),))
 
     rows = cur.fetchall()
     conn.close()
     return rows
 
 
-def save_audiodb(track_id, info):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+SAVE_AUDIODB_SQL = """
+    UPDATE tracks
+    SET genre = ?, mood = ?, bpm = ?, album_name = ?, album_thumb = ?
+    WHERE id = ?
+"""
+
 
-    cur.execute("""
-        UPDATE tracks
-        SET genre = ?, mood = ?, bpm = ?, album_name = ?, album_thumb = ?
-        WHERE id = ?
-    """, (
+def save_audiodb(track_id, info, writer=None):
+    params = (
         info.get("strGenre"),
         info.get("strMood"),
         info.get("intTempo"),
         info.get("strAlbum"),
         info.get("strTrackThumb"),
         track_id,
-    ))
+    )
+
+    if writer is not None:
+        writer.add(SAVE_AUDIODB_SQL, params)
+        return
 
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(SAVE_AUDIODB_SQL, params)
     conn.commit()
     conn.close()
 
@@ -89,58 +185,73 @@ def save_audiodb(track_id, info):
 # Main Pipeline
 # ----------------------------------------------------------
 
-def gather_audiodb():
-    tracks = get_tracks_missing_audiodb()
-    print(f"Tracks missing AudioDB: {len(tracks)}")
-
-    if not tracks:
-        print("All tracks already have AudioDB metadata.")
-        return
+def is_complete(info):
+    """True if the lookup filled every column MISSING_AUDIODB_SQL checks."""
+    return all(info.get(key) is not None for key in ("strGenre", "intTempo", "strAlbum"))
 
-    for track_id, title in tracks:
-        print(f"\n🎧 Fetching AudioDB for: {title}")
 
-        # Generate possible matches
-        attempts = []
+def record_miss(track_id, writer=None):
+    params = (track_id, datetime.datetime.now().isoformat(timespec="seconds"))
 
-        # 1. Exact title
-        attempts.append(title)
+    if writer is not None:
+        writer.add(RECORD_MISS_SQL, params)
+        return
 
-        # 2. Cleaned title (remove featuring + punctuation)
-        cleaned = clean_title_for_audiodb(title)
-        if cleaned not in attempts:
-            attempts.append(cleaned)
+    conn = get_connection()
+    conn.execute(RECORD_MISS_SQL, params)
+    conn.commit()
+    conn.close()
 
-        # 3. Remove apostrophes
-        no_apostrophes = cleaned.replace("'", "")
-        if no_apostrophes not in attempts:
-            attempts.append(no_apostrophes)
 
-        # 4. Remove trailing apostrophe slang (Darlin' → Darlin)
-        if cleaned.endswith("'"):
-            attempts.append(cleaned[:-1])
+def record_result(track_id, title, info, writer=None):
+    if not info:
+        record_miss(track_id, writer)
+        metrics.inc("audiodb_results_total", result="missing")
+        log.info("audiodb_not_found", track_id=track_id, title=title)
+        return
 
-        # Remove duplicates while keeping order
-        seen = set()
-        attempts = [x for x in attempts if not (x in seen or seen.add(x))]
+    save_audiodb(track_id, info, writer)
+    if not is_complete(info):
+        record_miss(track_id, writer)
+    metrics.inc("audiodb_results_total", result="found")
+    log.info("audiodb_saved", track_id=track_id, title=title, genre=info.get("strGenre"))
 
-        info = None
-        for attempt in attempts:
-            print(f"   🔎 Trying title: {attempt}")
-            info = get_track_details(attempt)
-            if info:
-                print("AudioDB match found!")
-                break
 
-        if not info:
-            print("No AudioDB match after all attempts — skipping.")
-            continue
+def gather_audiodb(concurrent=True):
+    tracks = get_tracks_missing_audiodb()
+    log.info("tracks_missing_audiodb", count=len(tracks))
 
-        save_audiodb(track_id, info)
-        print("   💾 Saved AudioDB metadata.")
+    if not tracks:
+        return
 
-    print("AudioDB stage complete.")
+    with BatchWriter(name="audiodb") as writer:
+        if not concurrent:
+            for track_id, title in tracks:
+                log.debug("audiodb_fetch", track_id=track_id, title=title)
+                record_result(track_id, title, lookup_track(title), writer)
+        else:
+            # Track workers only wait on variant futures, so the two pools are
+            # kept separate; the request pool size is the global in-flight cap.
+            with ThreadPoolExecutor(max_workers=AUDIODB_MAX_IN_FLIGHT) as request_pool, \
+                    ThreadPoolExecutor(max_workers=AUDIODB_TRACK_WORKERS) as track_pool:
+                futures = {
+                    track_pool.submit(lookup_track, title, request_pool): (track_id, title)
+                    for track_id, title in tracks
+                }
+                try:
+                    for future in as_completed(futures):
+                        track_id, title = futures[future]
+                        record_result(track_id, title, future.result(), writer)
+                except KeyboardInterrupt:
+                    # Drop queued tracks and requests; the writer still
+                    # commits what was recorded.
+                    track_pool.shutdown(wait=False, cancel_futures=True)
+                    request_pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+    log.info("audiodb_stage_complete")
 
 
 if __name__ == "__main__":
+    pipeline_log.configure()
     gather_audiodb()
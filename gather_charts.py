@@ -1,85 +1,110 @@
 # gather_charts.py
-import sqlite3
+import argparse
 import datetime
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 
-from db_setup import DB_NAME
+import chart_parser
+import http_client
+import metrics
+import pipeline_log
+import rate_limiter
+from db_setup import get_connection
+from db_writer import BatchWriter
+from fuzzy_matcher import FuzzyMatcher
+from track_matcher import TrackIndex, catalog_rows
 
 CHART_URL = "https://www.billboard.com/charts/hot-100"
+CHART_DATE_URL = "https://www.billboard.com/charts/hot-100/{date}/"
 CHART_NAME = "Billboard Hot 100"
 BATCH_LIMIT = 25 
+PARSER_BACKEND = "auto"   # "lxml", "stream" or "bs4" (see chart_parser.py)
 
+BACKFILL_WORKERS = 4      # chart pages fetched at the same time
+BILLBOARD_RATE = 1        # requests per second against billboard.com
+BILLBOARD_BURST = 2
 
-def fetch_chart_html(url=CHART_URL):
+log = pipeline_log.get_logger("gather_charts")
+
+metrics.describe("chart_parse_seconds", "Time to parse one chart page, by parser backend.")
+metrics.describe("chart_matches_total", "Chart entries matched to a track (exact or fuzzy) or left unmatched.")
+
+
+def fetch_chart_html(url=None, bucket=None):
+    import requests
+
+    url = url or CHART_URL   # looked up per call so CHART_URL can be repointed
     try:
-        resp = requests.get(
+        resp = http_client.get(
             url,
             headers={"User-Agent": "Mozilla/5.0"},
             timeout=10,
+            bucket=bucket,
         )
         resp.raise_for_status()
         return resp.text
     except requests.exceptions.RequestException as e:
-        print("Error fetching chart page:", e)
+        log.error("chart_fetch_failed", url=url, error=repr(e))
         return None
 
 
-def parse_chart(html):
-    soup = BeautifulSoup(html, "html.parser")
+def parse_chart(html, backend=None):
     entries = []
 
-    rows = soup.select("li.o-chart-results-list__item")
+    backend = backend or PARSER_BACKEND
+    with metrics.timer("chart_parse_seconds", backend=backend):
+        rows = chart_parser.parse_rows(html, backend)
     rank = 1
-    for row in rows:
-        title_tag = row.find("h3")
-        artist_tag = row.find("span", class_="c-label")
-
-        if not title_tag or not artist_tag:
-            continue
-
-        title = title_tag.get_text(strip=True)
-        artist = artist_tag.get_text(strip=True)
-
+    for title, artist in rows:
         if not title or not artist:
             continue
 
         entries.append({"rank": rank, "title": title, "artist": artist})
         rank += 1
 
-    print(f"Parsed {len(entries)} chart entries from page.")
+    log.debug("chart_parsed", entries=len(entries))
     return entries
 
 
-def find_track_id(conn, artist_name, title):
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM artists WHERE name = ?", (artist_name,))
-    row = cur.fetchone()
-    if not row:
-        return None
-    artist_id = row[0]
+INSERT_CHART_ROW_SQL = """
+    INSERT OR IGNORE INTO chart_popularity
+        (track_id, chart_name, chart_position, chart_date, match_confidence)
+    VALUES (?, ?, ?, ?, ?)
+"""
 
-    cur.execute(
-        "SELECT id FROM tracks WHERE artist_id = ? AND title = ?",
-        (artist_id, title),
-    )
-    row = cur.fetchone()
-    if row:
-        return row[0]
-    return None
-
-
-def insert_chart_row(conn, track_id, chart_name, chart_position, chart_date):
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT OR IGNORE INTO chart_popularity
-            (track_id, chart_name, chart_position, chart_date)
-        VALUES (?, ?, ?, ?)
-        """,
-        (track_id, chart_name, chart_position, chart_date)
-    )
-    return cur.rowcount  # 1 if inserted, 0 if duplicate ignored
+
+# Is a track already on today's chart? Rows that are won't count towards
+# BATCH_LIMIT (INSERT OR IGNORE would skip them anyway).
+CHARTED_SQL = """
+    SELECT 1 FROM chart_popularity
+    WHERE track_id = ? AND chart_name = ? AND chart_date = ?
+"""
+
+
+class ChartMatcher:
+    """
+    Exact TrackIndex lookup first, fuzzy fallback second.
+    The catalog is loaded once; the fuzzy index is only built if needed.
+    """
+
+    def __init__(self, conn):
+        self.catalog = list(catalog_rows(conn))
+        self.index = TrackIndex(self.catalog)
+        self.fuzzy = None
+
+    def match(self, artist, title):
+        """Return (track_id or None, confidence)."""
+        track_id = self.index.match(artist, title)
+        if track_id is not None:
+            return track_id, 1.0
+
+        if self.fuzzy is None:
+            self.fuzzy = FuzzyMatcher(self.catalog)
+        return self.fuzzy.match(artist, title)
+
+    def match_entries(self, entries):
+        """[(entry, track_id or None, confidence)] for parsed chart entries."""
+        return [(entry, *self.match(entry["artist"], entry["title"])) for entry in entries]
 
 
 def gather_chart_data():
@@ -89,43 +114,161 @@ def gather_chart_data():
 
     entries = parse_chart(html)
     if not entries:
-        print("No chart entries parsed.")
+        log.warning("chart_no_entries")
         return
 
-    conn = sqlite3.connect(DB_NAME)
-    inserted = 0
     today = datetime.date.today().isoformat()
 
-    for entry in entries:
-        if inserted >= BATCH_LIMIT:
-            break
+    # Resolve the whole page before opening the write transaction: building
+    # the fuzzy index can take a while and must not hold the write lock.
+    conn = get_connection(read_only=True)
+    matcher = ChartMatcher(conn)
+    rows = []
 
+    for entry, track_id, confidence in matcher.match_entries(entries):
         artist = entry["artist"]
         title = entry["title"]
-        rank = entry["rank"]
-
-        track_id = find_track_id(conn, artist, title)
 
         if track_id is None:
-            print(f"Skipping unmatched chart entry: {artist} - {title}")
+            metrics.inc("chart_matches_total", result="unmatched")
+            log.debug("chart_entry_unmatched", artist=artist, title=title)
             continue
 
-        print(f"Match found: {artist} - {title} (track_id={track_id})")
+        result = "exact" if confidence >= 1.0 else "fuzzy"
+        metrics.inc("chart_matches_total", result=result)
+        log.debug("chart_entry_matched", artist=artist, title=title, track_id=track_id,
+                  match=result, confidence=round(confidence, 2))
 
-        rows_added = insert_chart_row(
-            conn, track_id, CHART_NAME, rank, today
-        )
+        if len(rows) < BATCH_LIMIT and not conn.execute(
+            CHARTED_SQL, (track_id, CHART_NAME, today)
+        ).fetchone():
+            rows.append((track_id, CHART_NAME, entry["rank"], today, confidence))
+            log.info("chart_row_saved", rank=entry["rank"], artist=artist, title=title)
 
-        if rows_added > 0:
-            inserted += 1
-            print(
-                f"Saved chart row #{inserted}: rank {rank} – {artist} - {title}"
-            )
+    conn.close()
 
+    conn = get_connection()
+    before = conn.total_changes
+    conn.executemany(INSERT_CHART_ROW_SQL, rows)
+    inserted = conn.total_changes - before
     conn.commit()
     conn.close()
-    print("Done; inserted", inserted, "new matching rows.")
+    metrics.inc("db_rows_written_total", inserted, writer="charts")
+    log.info("chart_stage_complete", inserted=inserted)
+
+
+# ----------------------------------------------------------
+# Historical backfill
+# ----------------------------------------------------------
+
+def chart_dates(start_date, end_date):
+    """Every Saturday (Billboard's chart date) from start_date to end_date."""
+    day = start_date + datetime.timedelta(days=(5 - start_date.weekday()) % 7)
+    while day <= end_date:
+        yield day.isoformat()
+        day += datetime.timedelta(days=7)
+
+
+def get_completed_dates(conn, chart_name=CHART_NAME):
+    cur = conn.execute(
+        "SELECT chart_date FROM chart_backfill_progress WHERE chart_name = ?",
+        (chart_name,),
+    )
+    return {row[0] for row in cur.fetchall()}
+
+
+def fetch_dated_chart(chart_date):
+    """Fetch + parse one dated chart page (runs in a worker thread)."""
+    url = CHART_DATE_URL.format(date=chart_date)
+    bucket = rate_limiter.get_bucket(urlsplit(url).netloc, BILLBOARD_RATE, BILLBOARD_BURST)
+
+    html = fetch_chart_html(url, bucket)
+    if not html:
+        return None
+    return parse_chart(html)
+
+
+def backfill_charts(start_date, end_date, workers=BACKFILL_WORKERS):
+    """
+    Scrape every weekly chart between two dates into chart_popularity.
+    Finished dates are recorded in chart_backfill_progress in the same
+    batch as their chart rows, so an interrupted crawl resumes without
+    refetching them. Dates that fail to fetch are simply retried next run.
+    """
+    conn = get_connection()
+    done = get_completed_dates(conn)
+    todo = [d for d in chart_dates(start_date, end_date) if d not in done]
+    log.info("backfill_start", todo=len(todo), done=len(done))
+
+    if not todo:
+        conn.close()
+        return
+
+    matcher = ChartMatcher(conn)
+    conn.close()
+
+    total = 0
+    with BatchWriter(name="backfill") as writer, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_dated_chart, d): d for d in todo}
+        try:
+            for future in as_completed(futures):
+                chart_date = futures[future]
+                try:
+                    entries = future.result()
+                except Exception as e:
+                    log.error("backfill_parse_failed", chart_date=chart_date, error=repr(e))
+                    entries = None
+                if not entries:
+                    log.warning("backfill_no_entries", chart_date=chart_date)
+                    continue
+
+                matched = 0
+                for entry in entries:
+                    track_id, confidence = matcher.match(entry["artist"], entry["title"])
+                    if track_id is None:
+                        continue
+                    writer.add(
+                        INSERT_CHART_ROW_SQL,
+                        (track_id, CHART_NAME, entry["rank"], chart_date, confidence),
+                    )
+                    matched += 1
+
+                writer.add(
+                    """
+                    INSERT OR REPLACE INTO chart_backfill_progress
+                        (chart_name, chart_date, entries, matched, completed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (CHART_NAME, chart_date, len(entries), matched,
+                     datetime.datetime.now().isoformat(timespec="seconds")),
+                )
+                total += matched
+                log.info("backfill_chart_done", chart_date=chart_date,
+                         matched=matched, entries=len(entries))
+        except KeyboardInterrupt:
+            # Drop the queued dates; finished ones are committed by the writer
+            # and skipped next run.
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    log.info("backfill_complete", rows=total)
+
+
+def parse_date(text):
+    return datetime.date.fromisoformat(text)
 
 
 if __name__ == "__main__":
-    gather_chart_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape the Billboard Hot 100.")
+    parser.add_argument(
+        "--backfill", nargs=2, metavar=("START", "END"), type=parse_date,
+        help="crawl every weekly chart between two YYYY-MM-DD dates",
+    )
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    args = parser.parse_args()
+
+    pipeline_log.configure()
+    if args.backfill:
+        backfill_charts(*args.backfill, workers=args.workers)
+    else:
+        gather_chart_data()
\ No newline at end of file
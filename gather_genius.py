@@ -1,34 +1,80 @@
 # gather_genius.py
 # Uses Genius API to gather artist + song title metadata
-# Stores results in artists and tracks tables (no external IDs stored)
+# Stores results in artists and tracks tables, with the Genius song id, URL
+# and artist id, so a song Genius already resolved is never searched again.
+# Searches that added nothing are remembered in genius_misses.
 
+import datetime
 import os
-import sqlite3
-import requests
 
-from db_setup import DB_NAME
+import http_client
+import db_setup
+import metrics
+import pipeline_log
+from db_writer import BatchWriter
 
 GENIUS_TOKEN = os.environ.get("GENIUS_TOKEN")
 BASE_URL = "https://api.genius.com/search"
 
 BATCH_LIMIT = 25  # project requirement
+GENIUS_MISS_TTL_DAYS = 30  # searches with no hits are retried after this long
+
+log = pipeline_log.get_logger("gather_genius")
+
+metrics.describe("genius_results_total", "Genius searches: song added, missing, or a cached miss.")
+
+# artist name -> id for the connection used last. A batch that is rolled
+# back closes its writer connection, so ids of rolled-back artists are
+# dropped with it instead of being reused.
+_artist_cache = [None, {}]
 
 
 def get_connection():
-    return sqlite3.connect(DB_NAME)
+    return db_setup.get_connection()
 
 
-def get_or_create_artist(cur, artist_name):
-    cur.execute(
-        "INSERT OR IGNORE INTO artists (name) VALUES (?)",
-        (artist_name,)
-    )
+FIND_ARTIST_SQL = "SELECT id FROM artists WHERE name = ?"
+KNOWN_MISS_SQL = """
+    SELECT 1 FROM genius_misses
+    WHERE artist = ? AND title = ? AND searched_at >= ?
+"""
+
+
+def artist_ids(conn):
+    if _artist_cache[0] is not conn:
+        _artist_cache[:] = [conn, {}]
+    return _artist_cache[1]
+
+
+def find_artist(cur, artist_name):
+    ids = artist_ids(cur.connection)
+    artist_id = ids.get(artist_name)
+    if artist_id is None:
+        cur.execute(FIND_ARTIST_SQL, (artist_name,))
+        row = cur.fetchone()
+        if row:
+            artist_id = ids[artist_name] = row[0]
+    return artist_id
+
+
+def get_or_create_artist(cur, artist_name, genius_artist_id=None):
+    artist_id = find_artist(cur, artist_name)
+    if artist_id is not None:
+        if genius_artist_id is not None:
+            cur.execute(
+                "UPDATE artists SET genius_artist_id = ? WHERE id = ? AND genius_artist_id IS NULL",
+                (genius_artist_id, artist_id)
+            )
+        return artist_id
+
     cur.execute(
-        "SELECT id FROM artists WHERE name = ?",
-        (artist_name,)
+        "INSERT OR IGNORE INTO artists (name, genius_artist_id) VALUES (?, ?)",
+        (artist_name, genius_artist_id)
     )
-    row = cur.fetchone()
-    return row[0] if row else None
+    if cur.rowcount != 1:
+        return find_artist(cur, artist_name)
+    artist_id = artist_ids(cur.connection)[artist_name] = cur.lastrowid
+    return artist_id
 
 
 def track_exists(cur, artist_id, title):
@@ -42,53 +88,119 @@ def track_exists(cur, artist_id, title):
     return cur.fetchone() is not None
 
 
+def is_known_miss(cur, artist, title):
+    """True if this search added nothing within the last GENIUS_MISS_TTL_DAYS."""
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=GENIUS_MISS_TTL_DAYS)
+    cur.execute(KNOWN_MISS_SQL, (artist, title, cutoff.isoformat(timespec="seconds")))
+    return cur.fetchone() is not None
+
+
+def record_miss(cur, artist, title):
+    cur.execute(
+        "INSERT OR REPLACE INTO genius_misses (artist, title, searched_at) VALUES (?, ?, ?)",
+        (artist, title, datetime.datetime.now().isoformat(timespec="seconds"))
+    )
+
+
 def search_genius(artist, title):
+    """
+    Top Genius hit for a song, or None only when Genius returned no hits.
+    Raises when there is no token or the request fails, so callers never
+    mistake those for a miss.
+    """
     if not GENIUS_TOKEN:
-        return None
+        raise RuntimeError("GENIUS_TOKEN is not set")
 
     headers = {"Authorization": f"Bearer {GENIUS_TOKEN}"}
     params = {"q": f"{artist} {title}"}
 
-    resp = requests.get(BASE_URL, headers=headers, params=params, timeout=10)
+    resp = http_client.get(BASE_URL, headers=headers, params=params, timeout=10)
     resp.raise_for_status()
 
     data = resp.json()
-    hits = data.get("response", {}).get("hits", [])
+    hits = data["response"]["hits"]
     if not hits:
         return None
 
     return hits[0].get("result")
 
 
-def add_song_to_db(conn, artist, title):
+def note_write(conn, writer=None):
+    if writer is not None:
+        writer.note_write()
+    else:
+        conn.commit()
+
+
+def needs_search(conn, artist, title):
+    """
+    False when the song is already in the tracks table or is a recent
+    miss, so Genius doesn't have to be asked.
+    """
     cur = conn.cursor()
 
-    artist_id = get_or_create_artist(cur, artist)
-    if artist_id is None:
-        print(f"Could not create/find artist: {artist}")
+    artist_id = find_artist(cur, artist)
+    if artist_id is not None and track_exists(cur, artist_id, title):
+        log.debug("track_exists", artist=artist, title=title)
         return False
 
-    if track_exists(cur, artist_id, title):
-        print(f"Skipping existing: {artist} - {title}")
+    if is_known_miss(cur, artist, title):
+        metrics.inc("genius_results_total", result="cached_miss")
+        log.debug("genius_cached_miss", artist=artist, title=title)
         return False
 
-    genius_result = search_genius(artist, title)
-    if not genius_result:
-        print(f"No Genius result for {artist} - {title}")
-        return False
+    return True
+
+
+def store_search_result(conn, artist, title, genius_result, writer=None):
+    """
+    Insert the track for a search_genius result, or record the miss when
+    it was None. Returns the new track id, or None when nothing was added.
+    """
+    cur = conn.cursor()
+
+    if genius_result is None:
+        record_miss(cur, artist, title)
+        note_write(conn, writer)
+        metrics.inc("genius_results_total", result="missing")
+        log.info("genius_no_result", artist=artist, title=title)
+        return None
+
+    genius_artist_id = (genius_result.get("primary_artist") or {}).get("id")
+    artist_id = get_or_create_artist(cur, artist, genius_artist_id)
+    if artist_id is None:
+        log.error("artist_not_created", artist=artist)
+        return None
 
-    # IMPORTANT: tracks table does NOT have genius_song_id, so only insert columns that exist
     cur.execute(
         """
-        INSERT OR IGNORE INTO tracks (artist_id, title)
-        VALUES (?, ?)
+        INSERT OR IGNORE INTO tracks (artist_id, title, genius_song_id, genius_url)
+        VALUES (?, ?, ?, ?)
         """,
-        (artist_id, title)
+        (artist_id, title, genius_result.get("id"), genius_result.get("url"))
     )
-
-    conn.commit()
-    print(f"Added track: {artist} - {title}")
-    return True
+    if cur.rowcount != 1:
+        return None
+    track_id = cur.lastrowid
+
+    note_write(conn, writer)
+    metrics.inc("genius_results_total", result="added")
+    log.info("track_added", track_id=track_id, artist=artist, title=title)
+    return track_id
+
+
+def add_song_to_db(conn, artist, title, writer=None):
+    """
+    Insert a track if Genius knows it.
+    Returns the new track id, or None when nothing was added.
+    Songs already in the tracks table and recent misses are answered from
+    the database without calling Genius.
+    With a BatchWriter, conn should be writer.conn and the commit is left
+    to the writer's next batch instead of happening per song.
+    """
+    if not needs_search(conn, artist, title):
+        return None
+    return store_search_result(conn, artist, title, search_genius(artist, title), writer)
 
 
 def get_track_count(conn):
@@ -99,21 +211,20 @@ def get_track_count(conn):
 
 def gather_genius_data(song_list):
     if not GENIUS_TOKEN:
-        print("GENIUS_TOKEN not set.")
+        log.error("genius_token_missing")
         return
 
-    conn = get_connection()
     added = 0
 
-    for artist, title in song_list:
-        if added >= BATCH_LIMIT:
-            break
+    with BatchWriter(name="genius") as writer:
+        for artist, title in song_list:
+            if added >= BATCH_LIMIT:
+                break
 
-        if add_song_to_db(conn, artist, title):
-            added += 1
+            if add_song_to_db(writer.conn, artist, title, writer):
+                added += 1
 
-    conn.close()
-    print(f"New tracks added this run: {added}")
+    log.info("genius_stage_complete", added=added)
 
 
 # Pipeline can import this
@@ -128,4 +239,5 @@ def get_track_count(conn):
     return cur.fetchone()[0]
 
 if __name__ == "__main__":
+    pipeline_log.configure()
     gather_genius_data(SONGS)
\ No newline at end of file
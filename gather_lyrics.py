@@ -1,15 +1,46 @@
 # gather_lyrics.py
 # Robust lyrics collector for SI 201 Final Project
-# Maximizes lyric retrieval with retries, normalization, and failure caching.
+# Maximizes lyric retrieval with retries, normalization, and a retry
+# schedule (lyrics_retry table) with exponential backoff for misses.
 
-import sqlite3
-import requests
+import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 
-from db_setup import DB_NAME
+import http_client
+import lyrics_store
+import metrics
+import pipeline_log
+import rate_limiter
+from db_setup import get_connection
+from db_writer import BatchWriter
+from lyric_stats import lyric_stats
 
 LYRICS_URL = "https://api.lyrics.ovh/v1/{artist}/{title}"
 
+LYRICS_WORKERS = 1        # >1 fetches tracks concurrently
+LYRICS_RATE = 5           # requests per second allowed against lyrics.ovh
+LYRICS_BURST = 5
+
+# Tracks without lyrics are retried after base * 2**(attempts - 1) seconds,
+# capped at LYRICS_RETRY_MAX, where attempts counts failures of the same
+# kind. A 404 is usually final, so it backs off from a longer base and is
+# given up after LYRICS_NOT_FOUND_ATTEMPTS of them; transient errors never
+# count towards that.
+LYRICS_RETRY_BASE = 10 * 60              # timeouts, 429/5xx, connection errors
+LYRICS_NOT_FOUND_BASE = 24 * 60 * 60
+LYRICS_RETRY_MAX = 7 * 24 * 60 * 60
+LYRICS_NOT_FOUND_ATTEMPTS = 4
+LYRICS_RUN_LIMIT = None                  # most due tracks fetched per run (None = all)
+
+NOT_FOUND = "not_found"
+
+log = pipeline_log.get_logger("gather_lyrics")
+
+metrics.describe("lyrics_results_total", "Lyrics lookups: found, missing (404/empty) or error.")
+metrics.describe("http_retries_total", "Requests retried in place, by host and reason.")
+
 # -------------------------------
 # Helpers
 # -------------------------------
@@ -30,62 +61,186 @@ def normalize(text):
     )
 
 
+def has_lyrics(resp):
+    """Only lyrics.ovh answers that carry lyrics are cached; an empty 200 is
+    a miss that the retry schedule should really ask again about."""
+    if resp.status_code != 200:
+        return False
+    try:
+        return bool(str(resp.json().get("lyrics") or "").strip())
+    except (ValueError, AttributeError):
+        return False
+
+
 def fetch_lyrics(artist, title):
-    """Fetch lyrics with retry logic and timeout protection."""
+    """
+    Fetch lyrics with retry logic and timeout protection.
+    Returns (lyrics, None) or (None, error class): "not_found", "http_<status>"
+    or the name of the requests exception.
+    """
+    import requests
+
     url = LYRICS_URL.format(artist=artist, title=title)
+    bucket = rate_limiter.get_bucket(urlsplit(url).netloc, LYRICS_RATE, LYRICS_BURST)
 
     for attempt in range(2):  # Try maximum twice
         try:
-            resp = requests.get(url, timeout=6)
+            resp = http_client.get(url, timeout=6, bucket=bucket, cache_if=has_lyrics)
             if resp.status_code == 200:
                 data = resp.json()
                 if "lyrics" in data and data["lyrics"].strip():
-                    return data["lyrics"]
+                    return data["lyrics"], None
+                return None, NOT_FOUND
+            elif resp.status_code == 404:
+                return None, NOT_FOUND
             else:
-                return None  # No point retrying for 404, 500, etc.
+                return None, f"http_{resp.status_code}"  # retried later, with backoff
         except requests.exceptions.Timeout:
-            print(" Timeout — retrying…")
+            log.warning("lyrics_timeout_retry", artist=artist, title=title, attempt=attempt + 1)
+            metrics.inc("http_retries_total", host=urlsplit(url).netloc, reason="timeout")
             time.sleep(1)
-        except requests.exceptions.RequestException:
-            return None
+        except requests.exceptions.RequestException as e:
+            return None, type(e).__name__
+        except ValueError:
+            return None, "bad_response"   # not JSON
 
-    return None  # Failed twice
+    return None, "Timeout"  # Failed twice
 
 
-def get_tracks_missing_lyrics():
-    conn = sqlite3.connect(DB_NAME)
+def lookup_lyrics(artist, title):
+    """
+    Try the original artist/title first, then the normalized version.
+    Returns (lyrics, error) like fetch_lyrics; a transient error wins over
+    "not_found" so the track is retried soon.
+    """
+    lyrics, error = fetch_lyrics(artist, title)
+
+    if not lyrics:
+        art_norm = normalize(artist)
+        title_norm = normalize(title)
+        if (art_norm, title_norm) != (artist, title):
+            log.debug("lyrics_try_normalized", artist=art_norm, title=title_norm)
+            lyrics, norm_error = fetch_lyrics(art_norm, title_norm)
+            if error == NOT_FOUND:
+                error = norm_error
+
+    return lyrics, (None if lyrics else error)
+
+
+DUE_LYRICS_SQL = """
+    SELECT tracks.id, artists.name, tracks.title
+    FROM lyrics_retry
+    JOIN tracks ON tracks.id = lyrics_retry.track_id
+    JOIN artists ON artists.id = tracks.artist_id
+    WHERE lyrics_retry.next_attempt_at <= ?
+    ORDER BY lyrics_retry.next_attempt_at
+    LIMIT ?
+"""
+
+
+def now_text():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def get_tracks_missing_lyrics(limit=None):
+    """Tracks without lyrics that are due for an attempt, longest-waiting first."""
+    conn = get_connection(read_only=True)
     cur = conn.cursor()
 
-    cur.execute("""
-        SELECT tracks.id, artists.name, tracks.title
-        FROM tracks
-        JOIN artists ON artists.id = tracks.artist_id
-        LEFT JOIN lyrics ON lyrics.track_id = tracks.id
-        WHERE lyrics.track_id IS NULL;
-    """)
+    cur.execute(DUE_LYRICS_SQL, (now_text(), -1 if limit is None else limit))
 
     rows = cur.fetchall()
     conn.close()
     return rows
 
 
-def mark_failure(track_id):
-    """Insert a placeholder so we never retry permanently failing songs."""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT OR IGNORE INTO lyrics (track_id, lyrics_text) VALUES (?, ?)", 
-                (track_id, None))
+RETRY_ATTEMPTS_SQL = "SELECT attempts, not_found_attempts FROM lyrics_retry WHERE track_id = ?"
+SCHEDULE_RETRY_SQL = """
+    INSERT INTO lyrics_retry
+        (track_id, attempts, not_found_attempts, last_error, next_attempt_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(track_id) DO UPDATE SET
+        attempts = excluded.attempts,
+        not_found_attempts = excluded.not_found_attempts,
+        last_error = excluded.last_error,
+        next_attempt_at = excluded.next_attempt_at,
+        updated_at = excluded.updated_at
+"""
+CLEAR_RETRY_SQL = "DELETE FROM lyrics_retry WHERE track_id = ?"
+# Upsert (not INSERT OR REPLACE) so the summary-table update trigger fires.
+SAVE_LYRICS_SQL = """
+    INSERT INTO lyrics
+        (track_id, content_hash, char_count, word_count, line_count, unique_word_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(track_id) DO UPDATE SET
+        content_hash = excluded.content_hash,
+        char_count = excluded.char_count,
+        word_count = excluded.word_count,
+        line_count = excluded.line_count,
+        unique_word_count = excluded.unique_word_count
+"""
+
+
+def next_attempt_at(attempts, error, now=None):
+    """When to try again after `attempts` failures of error's kind; None = give up."""
+    if error == NOT_FOUND:
+        if attempts >= LYRICS_NOT_FOUND_ATTEMPTS:
+            return None
+        base = LYRICS_NOT_FOUND_BASE
+    else:
+        base = LYRICS_RETRY_BASE
+    delay = min(base * 2 ** min(attempts - 1, 30), LYRICS_RETRY_MAX)
+    now = now or datetime.datetime.now()
+    return (now + datetime.timedelta(seconds=delay)).isoformat(timespec="seconds")
+
+
+def mark_failure(track_id, writer=None, error=NOT_FOUND):
+    """Record a failed attempt and schedule the next one (exponential backoff)."""
+    conn = writer.conn if writer is not None else get_connection()
+    attempts, not_found = conn.execute(RETRY_ATTEMPTS_SQL, (track_id,)).fetchone() or (0, 0)
+    attempts += 1
+    if error == NOT_FOUND:
+        not_found += 1
+        due = next_attempt_at(not_found, error)
+    else:
+        due = next_attempt_at(attempts - not_found, error)
+    params = (track_id, attempts, not_found, error, due, now_text())
+
+    if writer is not None:
+        writer.add(SCHEDULE_RETRY_SQL, params)
+        return attempts
+
+    conn.execute(SCHEDULE_RETRY_SQL, params)
     conn.commit()
     conn.close()
+    return attempts
+
+
+def save_lyrics(track_id, lyrics_text, writer=None):
+    """
+    Save lyrics along with their stats (computed once, here). The text goes
+    into lyrics_blobs compressed, once per distinct text (lyrics_store.py),
+    and into the lyrics_fts search index.
+    """
+    blob = lyrics_store.blob_params(lyrics_text)
+    params = (track_id, blob[0]) + lyric_stats(lyrics_text)
+    conn = writer.conn if writer is not None else get_connection()
+    index = lyrics_store.index_statements(conn, track_id, lyrics_text)
 
+    if writer is not None:
+        writer.add(lyrics_store.SAVE_BLOB_SQL, blob)
+        writer.add(SAVE_LYRICS_SQL, params)
+        for sql, index_params in index:
+            writer.add(sql, index_params)
+        writer.add(CLEAR_RETRY_SQL, (track_id,))
+        return
 
-def save_lyrics(track_id, lyrics_text):
-    conn = sqlite3.connect(DB_NAME)
     cur = conn.cursor()
-    cur.execute(
-        "INSERT OR REPLACE INTO lyrics (track_id, lyrics_text) VALUES (?, ?)",
-        (track_id, lyrics_text)
-    )
+    cur.execute(lyrics_store.SAVE_BLOB_SQL, blob)
+    cur.execute(SAVE_LYRICS_SQL, params)
+    for sql, index_params in index:
+        cur.execute(sql, index_params)
+    cur.execute(CLEAR_RETRY_SQL, (track_id,))
     conn.commit()
     conn.close()
 
@@ -94,39 +249,72 @@ def save_lyrics(track_id, lyrics_text):
 # Main Logic
 # -------------------------------
 
-def gather_lyrics():
-    tracks = get_tracks_missing_lyrics()
-    print(f"Tracks missing lyrics: {len(tracks)}")
-
-    if not tracks:
-        return
+def record_result(track_id, lyrics, writer=None, error=NOT_FOUND):
+    """Save lyrics, or record the failure and when to retry, for one track."""
+    if lyrics:
+        save_lyrics(track_id, lyrics, writer)
+        metrics.inc("lyrics_results_total", result="found")
+        log.info("lyrics_saved", track_id=track_id, chars=len(lyrics))
+    else:
+        error = error or NOT_FOUND
+        attempts = mark_failure(track_id, writer, error)
+        metrics.inc("lyrics_results_total", result="missing" if error == NOT_FOUND else "error")
+        log.info("lyrics_not_found", track_id=track_id, error=error, attempts=attempts)
 
-    for track_id, artist, title in tracks:
 
-        print(f"\nFetching: {artist} – {title}")
+def gather_lyrics(workers=None):
+    """
+    Fetch lyrics for every track that is due in lyrics_retry (new tracks,
+    and earlier misses whose backoff has passed), up to LYRICS_RUN_LIMIT.
+    workers > 1 fetches tracks in a thread pool; the token bucket in
+    fetch_lyrics keeps the request rate polite either way (cached responses
+    don't use it). Results are
+    queued as each track finishes and committed in batches by a single
+    BatchWriter, so an interrupted run can be restarted.
+    """
+    if workers is None:
+        workers = LYRICS_WORKERS
 
-        # Try original first
-        lyrics = fetch_lyrics(artist, title)
+    tracks = get_tracks_missing_lyrics(LYRICS_RUN_LIMIT)
+    log.info("tracks_due_lyrics", count=len(tracks))
 
-        # Try normalized version if needed
-        if not lyrics:
-            art_norm = normalize(artist)
-            title_norm = normalize(title)
-            if (art_norm, title_norm) != (artist, title):
-                print(f" Trying normalized: '{art_norm}' / '{title_norm}'")
-                lyrics = fetch_lyrics(art_norm, title_norm)
+    if not tracks:
+        return
 
-        # Save or mark failure
-        if lyrics:
-            save_lyrics(track_id, lyrics)
-            print("  Saved lyrics.")
-        else:
-            mark_failure(track_id)
-            print("  Failed twice — marked as no-lyrics found.")
+    with BatchWriter(name="lyrics") as writer:
+        if workers <= 1:
+            for track_id, artist, title in tracks:
+                log.debug("lyrics_fetch", track_id=track_id, artist=artist, title=title)
+                lyrics, error = lookup_lyrics(artist, title)
+                record_result(track_id, lyrics, writer, error)
+            return
 
-        # Short sleep to avoid rate limiting
-        time.sleep(0.4)
+        # Network calls run in the pool; DB writes stay on this thread.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(lookup_lyrics, artist, title): (track_id, artist, title)
+                for track_id, artist, title in tracks
+            }
+            try:
+                for future in as_completed(futures):
+                    track_id, artist, title = futures[future]
+                    log.debug("lyrics_fetched", track_id=track_id, artist=artist, title=title)
+                    lyrics, error = future.result()
+                    record_result(track_id, lyrics, writer, error)
+            except KeyboardInterrupt:
+                # Drop the queued lookups; only the ones in flight are waited
+                # for, and the writer still commits what was recorded.
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
 
 
 if __name__ == "__main__":
-    gather_lyrics()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fetch lyrics for tracks that are due.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"tracks fetched at the same time (default {LYRICS_WORKERS})")
+    args = parser.parse_args()
+
+    pipeline_log.configure()
+    gather_lyrics(args.workers)
\ No newline at end of file
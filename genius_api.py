@@ -1,12 +1,18 @@
 import os
-import requests
+
+import http_client
+import pipeline_log
+
+log = pipeline_log.get_logger("genius_api")
+
 
 def search_genius_song(search_term):
+    import requests
+
     token = os.environ.get("GENIUS_TOKEN")
-    print("DEBUG GENIUS_TOKEN in function =", repr(token))  # don't paste this output online
 
     if not token:
-        print("GENIUS_TOKEN not set inside Python.")
+        log.error("genius_token_missing")
         return None
 
     url = "https://api.genius.com/search"
@@ -14,23 +20,23 @@ def search_genius_song(search_term):
     params = {"q": search_term}
 
     try:
-        resp = requests.get(url, headers=headers, params=params)
+        resp = http_client.get(url, headers=headers, params=params)
         resp.raise_for_status()
         data = resp.json()
         hits = data.get("response", {}).get("hits", [])
         if not hits:
-            print("No Genius results.")
+            log.info("genius_no_results", query=search_term)
             return None
         first = hits[0]["result"]
-        print("Genius search worked:")
-        print(first.get("title"), "-", first.get("artist_names"))
-        print(first.get("url"))
+        log.info("genius_search_ok", title=first.get("title"),
+                 artist=first.get("artist_names"), url=first.get("url"))
         return first
     except requests.exceptions.RequestException as e:
-        print("Genius error:", e)
+        log.error("genius_request_failed", query=search_term, error=repr(e))
         return None
 
 
 if __name__ == "__main__":
-    print("GENIUS_TOKEN at top-level =", repr(os.environ.get("GENIUS_TOKEN")))
+    pipeline_log.configure()
+    log.info("genius_token", set=bool(os.environ.get("GENIUS_TOKEN")))
     search_genius_song("Imagine Dragons Believer")
\ No newline at end of file
@@ -0,0 +1,250 @@
+# http_cache.py
+# Persistent response cache shared by every API wrapper (through http_client).
+# Stored in its own SQLite file so it never touches music_project.db.
+# Entries are keyed by the normalized URL + query params, expire after a
+# per-host TTL, are evicted least-recently-used past a size cap, and are
+# revalidated with ETag / Last-Modified when the server sent them.
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+
+CACHE_DB = "http_cache.db"
+ENABLED = True
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+DEFAULT_TTL = DAY
+TTL_BY_HOST = {
+    "www.billboard.com": DAY,          # chart updates weekly, check daily
+    "api.genius.com": 7 * DAY,
+    "theaudiodb.com": 30 * DAY,
+    "api.lyrics.ovh": 365 * DAY,       # lyrics basically never change
+}
+
+CACHEABLE_STATUS = {200}
+
+# Headers that describe the wire format, not the (already decoded) body.
+DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+metrics.describe("http_cache_events_total", "HTTP cache hits, misses, revalidations, stores and evictions.")
+
+_conn = None
+_total_bytes = 0
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+
+
+def get_cache_conn():
+    global _conn, _total_bytes
+
+    if _conn is None:
+        _conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                accessed_at REAL,
+                size INTEGER
+            )
+        """)
+        _conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)"
+        )
+        _conn.commit()
+        _total_bytes = _conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    return _conn
+
+
+def cache_key(url, params=None):
+    """Normalize scheme/host case and sort query params so equal requests share a key."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(k), str(v)) for k, v in dict(params).items())
+    query.sort()
+
+    normalized = urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path or "/",
+        urlencode(query),
+        "",
+    ))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest(), normalized
+
+
+def ttl_for(url):
+    return TTL_BY_HOST.get(urlsplit(url).netloc.lower(), DEFAULT_TTL)
+
+
+def lookup(url, params=None):
+    """
+    Return (entry, fresh) for a request, or (None, False) on a miss.
+    entry is a dict with the stored response fields.
+    """
+    key, normalized = cache_key(url, params)
+
+    with _lock:
+        row = get_cache_conn().execute(
+            """
+            SELECT status, headers, body, etag, last_modified, stored_at
+            FROM responses WHERE key = ?
+            """,
+            (key,),
+        ).fetchone()
+
+    if row is None:
+        return None, False
+
+    status, headers, body, etag, last_modified, stored_at = row
+    entry = {
+        "key": key,
+        "url": normalized,
+        "status": status,
+        "headers": json.loads(headers),
+        "body": body,
+        "etag": etag,
+        "last_modified": last_modified,
+    }
+    fresh = time.time() - stored_at < ttl_for(url)
+    return entry, fresh
+
+
+def conditional_headers(entry):
+    """If-None-Match / If-Modified-Since for revalidating a stale entry."""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def touch(key, refreshed=False):
+    """Mark an entry as used (and as re-validated when refreshed=True)."""
+    now = time.time()
+    with _lock:
+        conn = get_cache_conn()
+        if refreshed:
+            conn.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+        else:
+            conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        conn.commit()
+
+
+def store(url, params, resp):
+    """Save a response if it's cacheable."""
+    global _total_bytes
+
+    if resp.status_code not in CACHEABLE_STATUS:
+        return
+
+    key, normalized = cache_key(url, params)
+    body = resp.content
+    headers = {
+        k: v for k, v in resp.headers.items() if k.lower() not in DROP_HEADERS
+    }
+    now = time.time()
+
+    with _lock:
+        conn = get_cache_conn()
+        old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO responses
+                (key, url, status, headers, body, etag, last_modified,
+                 stored_at, accessed_at, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                key, normalized, resp.status_code, json.dumps(headers), body,
+                resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                now, now, len(body),
+            ),
+        )
+        _total_bytes += len(body) - (old[0] if old else 0)
+        _stats["stores"] += 1
+        evict(conn)
+        conn.commit()
+
+
+def evict(conn):
+    """Drop least-recently-used entries until we're under MAX_CACHE_BYTES."""
+    global _total_bytes
+
+    while _total_bytes > MAX_CACHE_BYTES:
+        rows = conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100"
+        ).fetchall()
+        if not rows:
+            _total_bytes = 0
+            return
+        for key, size in rows:
+            if _total_bytes <= MAX_CACHE_BYTES:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            _total_bytes -= size
+            _stats["evictions"] += 1
+
+
+def to_response(entry):
+    """Rebuild a requests.Response from a cache entry."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.headers = CaseInsensitiveDict(entry["headers"])
+    resp._content = entry["body"]
+    resp.url = entry["url"]
+    resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+    resp.from_cache = True
+    return resp
+
+
+def record(event, host=None):
+    with _lock:
+        _stats[event] += 1
+    metrics.inc("http_cache_events_total", event=event, host=host or "")
+
+
+def stats():
+    """Hit/miss counters for this process."""
+    with _lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+    result["bytes"] = _total_bytes
+    return result
+
+
+def clear():
+    global _total_bytes
+    with _lock:
+        conn = get_cache_conn()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+        _total_bytes = 0
@@ -0,0 +1,153 @@
+# http_client.py
+# Shared HTTP layer for the API wrappers and the chart scraper.
+# Keeps one keep-alive requests.Session per host so repeated calls reuse
+# the same TCP/TLS connection instead of doing a fresh handshake each time.
+
+# requests is imported on first use, so importing this module (and every
+# API wrapper) stays cheap for stages that never touch the network.
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import http_cache
+import metrics
+
+DEFAULT_TIMEOUT = 10      # seconds, used when a caller doesn't pass one
+POOL_CONNECTIONS = 4      # connection pools cached per session
+POOL_MAXSIZE = 16         # keep-alive sockets per pool (>= worker threads)
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+metrics.describe("http_requests_total", "HTTP requests sent, by host and status code or exception name.")
+metrics.describe("http_request_seconds", "Wall time of HTTP requests that went to the network.")
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(host):
+    """Return the keep-alive Session for a host, creating it on first use."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def get(url, params=None, headers=None, timeout=None, use_cache=True, bucket=None,
+        cache_if=None):
+    """
+    GET through the pooled session for the url's host.
+    Fresh responses come straight from http_cache; stale ones are
+    revalidated with ETag / Last-Modified when possible.
+    cache_if(resp) -> bool can veto storing a response (e.g. a 200 that
+    carries no data and should be asked for again on the next try); a
+    stored entry it rejects is treated as a miss.
+    A rate_limiter bucket is only drawn from when the request really goes
+    out, so cache hits are never throttled.
+    Raises requests.exceptions.RequestException just like requests.get.
+    """
+    use_cache = use_cache and http_cache.ENABLED
+    entry = None
+    host = urlsplit(url).netloc
+
+    if use_cache:
+        entry, fresh = http_cache.lookup(url, params)
+        if entry and cache_if is not None and not cache_if(http_cache.to_response(entry)):
+            entry = None        # stored before the caller started vetoing it
+        if entry and fresh:
+            http_cache.record("hits", host)
+            http_cache.touch(entry["key"])
+            return http_cache.to_response(entry)
+        if entry:
+            headers = dict(headers or {})
+            headers.update(http_cache.conditional_headers(entry))
+
+    session = get_session(host)
+    if bucket is not None:
+        bucket.acquire()
+
+    start = time.perf_counter()
+    try:
+        resp = session.get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout if timeout is not None else DEFAULT_TIMEOUT,
+        )
+    except Exception as e:
+        metrics.inc("http_requests_total", host=host, status=type(e).__name__)
+        raise
+    finally:
+        metrics.observe("http_request_seconds", time.perf_counter() - start, host=host)
+    metrics.inc("http_requests_total", host=host, status=resp.status_code)
+
+    if use_cache:
+        if resp.status_code == 304 and entry:
+            http_cache.record("hits", host)
+            http_cache.record("revalidated", host)
+            http_cache.touch(entry["key"], refreshed=True)
+            return http_cache.to_response(entry)
+        http_cache.record("misses", host)
+        if cache_if is None or cache_if(resp):
+            http_cache.store(url, params, resp)
+
+    return resp
+
+
+def connection_stats():
+    """
+    Connection-reuse counters per host:
+    {host: {"requests": n, "connections": n, "reused": n}}
+    """
+    stats = {}
+
+    with _lock:
+        sessions = list(_sessions.items())
+
+    for host, session in sessions:
+        requests_made = 0
+        connections = 0
+
+        adapters = {id(a): a for a in session.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+
+        stats[host] = {
+            "requests": requests_made,
+            "connections": connections,
+            "reused": max(requests_made - connections, 0),
+        }
+
+    return stats
+
+
+def close_all():
+    """Close every pooled session (drops the keep-alive sockets)."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+
+    for session in sessions:
+        session.close()
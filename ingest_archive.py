@@ -0,0 +1,147 @@
+# ingest_archive.py
+# Ingest a directory of saved Billboard chart pages into chart_popularity.
+# Parsing is spread over a process pool (one worker per core); matching and
+# all DB writes happen in this process through a single BatchWriter.
+# Each file's content hash is recorded, so re-running over the same
+# directory skips pages that were already ingested.
+#
+#   python ingest_archive.py path/to/snapshots [--workers 8]
+
+import argparse
+import datetime
+import glob
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pipeline_log
+from db_setup import get_connection
+from db_writer import BatchWriter
+from gather_charts import CHART_NAME, INSERT_CHART_ROW_SQL, ChartMatcher, parse_chart
+
+FILENAME_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+PAGE_DATE = re.compile(r"Week of\s+([A-Z][a-z]+ \d{1,2}, \d{4})")
+
+log = pipeline_log.get_logger("ingest_archive")
+
+# Set in each worker by init_worker: hashes that don't need parsing.
+known_hashes = set()
+
+
+def init_worker(hashes):
+    global known_hashes
+    known_hashes = hashes
+
+
+def chart_date_for(path, html):
+    """YYYY-MM-DD from the file name, else from the page's "Week of ..." label."""
+    match = FILENAME_DATE.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime.date(*map(int, match.groups())).isoformat()
+        except ValueError:
+            pass
+
+    match = PAGE_DATE.search(html)
+    if match:
+        try:
+            return datetime.datetime.strptime(match.group(1), "%B %d, %Y").date().isoformat()
+        except ValueError:
+            pass
+
+    return None
+
+
+def parse_archived_page(path):
+    """
+    Worker: returns (path, content hash, chart date, entries).
+    entries is None when the hash is already ingested.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    if content_hash in known_hashes:
+        return path, content_hash, None, None
+
+    html = data.decode("utf-8", errors="replace")
+    return path, content_hash, chart_date_for(path, html), parse_chart(html)
+
+
+def get_ingested_hashes(conn):
+    cur = conn.execute("SELECT content_hash FROM chart_archive_files")
+    return {row[0] for row in cur.fetchall()}
+
+
+def ingest_archive(directory, workers=None, pattern="*.html"):
+    paths = sorted(glob.glob(os.path.join(directory, "**", pattern), recursive=True))
+    log.info("archive_found", pages=len(paths), directory=directory)
+    if not paths:
+        return
+
+    conn = get_connection()
+    known = get_ingested_hashes(conn)
+    matcher = ChartMatcher(conn)
+    conn.close()
+
+    start = time.perf_counter()
+    parsed = skipped = rows = 0
+
+    with BatchWriter(name="archive") as writer, ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=init_worker,
+        initargs=(known,),
+    ) as pool:
+        futures = [pool.submit(parse_archived_page, p) for p in paths]
+        for future in as_completed(futures):
+            path, content_hash, chart_date, entries = future.result()
+
+            if entries is None or content_hash in known:
+                skipped += 1
+                continue
+            known.add(content_hash)   # identical copies later in this run
+
+            if chart_date is None:
+                log.warning("archive_no_chart_date", path=path)
+                continue
+
+            matched = 0
+            for entry in entries:
+                track_id, confidence = matcher.match(entry["artist"], entry["title"])
+                if track_id is None:
+                    continue
+                writer.add(
+                    INSERT_CHART_ROW_SQL,
+                    (track_id, CHART_NAME, entry["rank"], chart_date, confidence),
+                )
+                matched += 1
+
+            writer.add(
+                """
+                INSERT OR REPLACE INTO chart_archive_files
+                    (content_hash, path, chart_date, entries, matched, ingested_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (content_hash, path, chart_date, len(entries), matched,
+                 datetime.datetime.now().isoformat(timespec="seconds")),
+            )
+            parsed += 1
+            rows += matched
+
+    elapsed = time.perf_counter() - start
+    rate = parsed / elapsed if elapsed else 0.0
+    log.info("archive_ingested", parsed=parsed, skipped=skipped, rows=rows,
+             pages_per_second=round(rate, 1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest saved Billboard chart pages.")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--pattern", default="*.html")
+    args = parser.parse_args()
+
+    pipeline_log.configure()
+    ingest_archive(args.directory, args.workers, args.pattern)
@@ -0,0 +1,56 @@
+# lyric_stats.py
+# Lyric statistics computed once when lyrics are saved, so reports can
+# read small integer columns instead of pulling every lyric into Python.
+
+import string
+
+STATS_COLUMNS = ("char_count", "word_count", "line_count", "unique_word_count")
+
+PUNCTUATION = string.punctuation + "’‘“”"
+
+
+def lyric_stats(text):
+    """
+    Input:  lyrics text (string) or None
+    Output: (char_count, word_count, line_count, unique_word_count),
+            all None when there's no text
+    """
+    if text is None:
+        return (None, None, None, None)
+
+    words = text.split()
+    unique = {w.strip(PUNCTUATION).lower() for w in words}
+    unique.discard("")
+    lines = [line for line in text.splitlines() if line.strip()]
+
+    return (len(text), len(words), len(lines), len(unique))
+
+
+def backfill_lyric_stats(cur, batch_size=1000):
+    """
+    Fill the stats columns for lyrics rows saved before they existed.
+    Returns how many rows were updated.
+    """
+    updated = 0
+    while True:
+        cur.execute(
+            """
+            SELECT track_id, lyrics_text FROM lyrics
+            WHERE lyrics_text IS NOT NULL AND char_count IS NULL
+            LIMIT ?
+            """,
+            (batch_size,),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            return updated
+
+        cur.executemany(
+            """
+            UPDATE lyrics
+            SET char_count = ?, word_count = ?, line_count = ?, unique_word_count = ?
+            WHERE track_id = ?
+            """,
+            [lyric_stats(text) + (track_id,) for track_id, text in rows],
+        )
+        updated += len(rows)
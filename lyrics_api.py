@@ -1,26 +1,31 @@
 # lyrics_api.py
 # Simple wrapper for lyrics.ovh API
 
-import requests
+import http_client
+import pipeline_log
 
 BASE_URL = "https://api.lyrics.ovh/v1"
 
+log = pipeline_log.get_logger("lyrics_api")
+
 def get_lyrics(artist, title):
     """
     Input:  artist (string), title (string)
     Output: lyrics text (string) OR None
     """
+    import requests
+
     url = f"{BASE_URL}/{artist}/{title}"
 
     try:
-        resp = requests.get(url)
+        resp = http_client.get(url)
         resp.raise_for_status()
         data = resp.json()
         lyrics = data.get("lyrics")
         if not lyrics:
-            print(f"⚠️ No lyrics found for {artist} - {title}")
+            log.info("lyrics_not_found", artist=artist, title=title)
             return None
         return lyrics
     except requests.exceptions.RequestException as e:
-        print(f"❌ Lyrics.ovh error for {artist} - {title}: {e}")
+        log.error("lyrics_request_failed", artist=artist, title=title, error=repr(e))
         return None
\ No newline at end of file
@@ -0,0 +1,192 @@
+# lyrics_search.py
+# Full-text search over lyrics through the lyrics_fts index (contentless
+# FTS5, kept up to date when lyrics are saved, see db_setup.create_lyrics_fts).
+# Queries only touch the index; matching_lines decompresses the few hits
+# it prints.
+#
+#   python lyrics_search.py snow                  # ranked (BM25)
+#   python lyrics_search.py --unranked snow       # any matches, fastest
+#   python lyrics_search.py --phrase "let it snow"
+#   python lyrics_search.py --prefix christ
+#   python lyrics_search.py --df snow love night  # document frequencies
+#   python lyrics_search.py --rebuild --trigram   # switch tokenizer
+
+import argparse
+import sys
+
+import db_setup
+import lyrics_store
+
+TRIGRAM = "trigram"
+
+# Ranked top-N runs inside FTS5 first (ORDER BY rank LIMIT), then joins the
+# few hits to tracks/artists.
+SEARCH_SQL = """
+    SELECT hits.rowid, artists.name, tracks.title, hits.rank
+    FROM (
+        SELECT rowid, rank FROM lyrics_fts
+        WHERE lyrics_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    ) AS hits
+    JOIN tracks ON tracks.id = hits.rowid
+    JOIN artists ON artists.id = tracks.artist_id
+    ORDER BY hits.rank
+"""
+# Unranked: FTS5 returns hits in rowid order and stops at the LIMIT, so
+# even a word in most songs costs well under a millisecond.
+MENTIONS_SQL = """
+    SELECT hits.rowid, artists.name, tracks.title, NULL
+    FROM (
+        SELECT rowid FROM lyrics_fts
+        WHERE lyrics_fts MATCH ?
+        LIMIT ?
+    ) AS hits
+    JOIN tracks ON tracks.id = hits.rowid
+    JOIN artists ON artists.id = tracks.artist_id
+"""
+COUNT_SQL = "SELECT COUNT(*) FROM lyrics_fts WHERE lyrics_fts MATCH ?"
+VOCAB_SQL = "SELECT doc, cnt FROM lyrics_fts_vocab WHERE term = ?"
+TOP_TERMS_SQL = """
+    SELECT term, doc, cnt FROM lyrics_fts_vocab
+    WHERE length(term) >= ?
+    ORDER BY doc DESC
+    LIMIT ?
+"""
+
+
+def quote(text):
+    """FTS5 string literal: matches the words in order, as a phrase."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def phrase_query(text):
+    return quote(text)
+
+
+def prefix_query(prefix):
+    return quote(prefix) + " *"
+
+
+def search(conn, query, limit=20, ranked=True):
+    """
+    Tracks matching an FTS5 query, best first.
+    Returns [(track_id, artist, title, score)]; lower score = better (BM25).
+    BM25 scores every matching song, so for a word found in most of the
+    corpus ranked=False (any `limit` matches, score None) is far faster.
+    """
+    sql = SEARCH_SQL if ranked else MENTIONS_SQL
+    return conn.execute(sql, (query, limit)).fetchall()
+
+
+def search_phrase(conn, text, limit=20, ranked=True):
+    return search(conn, phrase_query(text), limit, ranked)
+
+
+def search_prefix(conn, prefix, limit=20, ranked=True):
+    return search(conn, prefix_query(prefix), limit, ranked)
+
+
+def count_matches(conn, query):
+    return conn.execute(COUNT_SQL, (query,)).fetchone()[0]
+
+
+def document_frequency(conn, term):
+    """
+    (documents containing term, total occurrences) from the index vocabulary.
+    Terms are looked up as tokenized (lowercase for unicode61). With the
+    trigram tokenizer the vocabulary holds trigrams, so the document count
+    comes from a MATCH instead and occurrences is None.
+    """
+    row = conn.execute(VOCAB_SQL, (term.lower(),)).fetchone()
+    if row:
+        return row
+    if is_trigram(conn) and len(term) >= 3:
+        return count_matches(conn, quote(term)), None
+    return 0, 0
+
+
+def top_terms(conn, limit=20, min_length=3):
+    """Most widespread terms: [(term, documents, occurrences)]."""
+    return conn.execute(TOP_TERMS_SQL, (min_length, limit)).fetchall()
+
+
+def matching_lines(conn, track_id, words, limit=3):
+    """Lines of one track's lyrics containing any of the words."""
+    text = lyrics_store.get_lyrics(conn, track_id) or ""
+    words = [w.lower() for w in words]
+    lines = [line.strip() for line in text.splitlines()
+             if any(w in line.lower() for w in words)]
+    return lines[:limit]
+
+
+def is_trigram(conn):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'lyrics_fts'").fetchone()
+    return bool(row) and f"tokenize='{TRIGRAM}'" in row[0]
+
+
+def rebuild_index(tokenizer=None):
+    """Recreate lyrics_fts (with another tokenizer) and re-index every lyric."""
+    conn = db_setup.get_connection()
+    cur = conn.cursor()
+    db_setup.create_lyrics_fts(cur, tokenizer, rebuild=True)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search lyrics (FTS5).")
+    parser.add_argument("query", nargs="*", help="FTS5 query, or terms for --df")
+    parser.add_argument("--phrase", action="store_true", help="match the words as a phrase")
+    parser.add_argument("--prefix", action="store_true", help="match words starting with query")
+    parser.add_argument("--unranked", action="store_true", help="any matches, no BM25 ordering")
+    parser.add_argument("--df", action="store_true", help="document frequency per term")
+    parser.add_argument("--top-terms", type=int, metavar="N", help="N most widespread terms")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="recreate the index")
+    parser.add_argument("--trigram", action="store_true", help="with --rebuild: trigram tokenizer")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_index(TRIGRAM if args.trigram else db_setup.LYRICS_FTS_TOKENIZER)
+        print("lyrics_fts rebuilt")
+        if not args.query:
+            return 0
+
+    conn = db_setup.get_connection(read_only=True)
+
+    if args.top_terms:
+        for term, docs, count in top_terms(conn, args.top_terms):
+            print(f"{term:<20} {docs:>8} docs {count:>9} times")
+        return 0
+
+    if not args.query:
+        parser.error("a query is required")
+
+    if args.df:
+        for term in args.query:
+            docs, count = document_frequency(conn, term)
+            print(f"{term:<20} {docs:>8} docs {count if count is not None else '-':>9} times")
+        return 0
+
+    text = " ".join(args.query)
+    if args.phrase:
+        query = phrase_query(text)
+    elif args.prefix:
+        query = prefix_query(text)
+    else:
+        query = text
+
+    hits = search(conn, query, args.limit, ranked=not args.unranked)
+    print(f"{count_matches(conn, query)} tracks match {query}")
+    for track_id, artist, title, score in hits:
+        score_text = f"{score:8.2f}" if score is not None else " " * 8
+        print(f"{score_text}  {artist} - {title}")
+        for line in matching_lines(conn, track_id, args.query, limit=1):
+            print(f"          {line}")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
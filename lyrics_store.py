@@ -0,0 +1,151 @@
+# lyrics_store.py
+# Lyrics are stored once per distinct text, compressed, in lyrics_blobs
+# (keyed by the SHA-256 of the text); lyrics rows point at their blob with
+# content_hash, so covers and duplicate credits share one copy.
+# New blobs use zlib, which every Python can read. zstd compresses a bit
+# better but is opt-in (CODEC = "zstd"): a database with zstd blobs can
+# only be read where the zstandard package is installed. The codec is kept
+# per blob, so a database can mix both.
+
+import hashlib
+import zlib
+
+CODEC = "zlib"            # or "zstd" (needs the zstandard package)
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+
+SAVE_BLOB_SQL = """
+    INSERT OR IGNORE INTO lyrics_blobs (content_hash, codec, body, raw_size)
+    VALUES (?, ?, ?, ?)
+"""
+# lyrics_fts (db_setup.create_lyrics_fts) is contentless: it keeps only the
+# index, and taking a row out needs the text that was indexed. SQLite can't
+# decompress blobs, so both happen in Python through index_statements().
+INDEX_LYRICS_SQL = "INSERT INTO lyrics_fts (rowid, lyrics) VALUES (?, ?)"
+UNINDEX_LYRICS_SQL = "INSERT INTO lyrics_fts (lyrics_fts, rowid, lyrics) VALUES ('delete', ?, ?)"
+INDEXED_SQL = "SELECT 1 FROM lyrics_fts WHERE rowid = ?"
+LYRICS_BLOB_SQL = """
+    SELECT lyrics_blobs.codec, lyrics_blobs.body
+    FROM lyrics
+    JOIN lyrics_blobs ON lyrics_blobs.content_hash = lyrics.content_hash
+    WHERE lyrics.track_id = ?
+"""
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd lyrics blobs need the zstandard package (pip install zstandard)")
+    return zstandard
+
+
+def compress(text, codec=None):
+    codec = codec or CODEC
+    data = text.encode("utf-8")
+    if codec == "zstd":
+        return zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(codec, body):
+    if body is None:
+        return None
+    if codec == "zstd":
+        return zstandard().ZstdDecompressor().decompress(body).decode("utf-8")
+    return zlib.decompress(body).decode("utf-8")
+
+
+def blob_params(text):
+    """(content_hash, codec, body, raw_size) for SAVE_BLOB_SQL."""
+    return (content_hash(text), CODEC, compress(text), len(text))
+
+
+def get_lyrics(conn, track_id):
+    """Decompressed lyrics for a track, or None."""
+    row = conn.execute(LYRICS_BLOB_SQL, (track_id,)).fetchone()
+    return decompress(*row) if row else None
+
+
+def index_statements(conn, track_id, text):
+    """
+    [(sql, params)] that keep lyrics_fts in step when a track's lyrics are
+    saved (text) or deleted (text=None). Build them before the lyrics row
+    changes: the indexed copy is taken out with the text its blob holds now.
+    """
+    statements = []
+    if conn.execute(INDEXED_SQL, (track_id,)).fetchone():
+        old = get_lyrics(conn, track_id)
+        if old is not None:
+            statements.append((UNINDEX_LYRICS_SQL, (track_id, old)))
+    if text is not None:
+        statements.append((INDEX_LYRICS_SQL, (track_id, text)))
+    return statements
+
+
+def migrate_lyrics_text(cur, batch_size=1000):
+    """
+    Move lyrics.lyrics_text (databases from before lyrics_blobs) into
+    compressed blobs, then drop the column. Returns how many rows moved.
+    """
+    moved = 0
+    last_id = -1
+    while True:
+        cur.execute(
+            """
+            SELECT track_id, lyrics_text FROM lyrics
+            WHERE lyrics_text IS NOT NULL AND track_id > ?
+            ORDER BY track_id
+            LIMIT ?
+            """,
+            (last_id, batch_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+
+        blobs = [(track_id, blob_params(text)) for track_id, text in rows]
+        cur.executemany(SAVE_BLOB_SQL, [params for _, params in blobs])
+        cur.executemany(
+            "UPDATE lyrics SET content_hash = ? WHERE track_id = ?",
+            [(params[0], track_id) for track_id, params in blobs],
+        )
+        moved += len(rows)
+        last_id = rows[-1][0]
+
+    cur.execute("ALTER TABLE lyrics DROP COLUMN lyrics_text")
+    return moved
+
+
+def index_lyrics(cur, batch_size=1000):
+    """Add every stored lyric to an empty lyrics_fts. Returns how many rows were indexed."""
+    indexed = 0
+    last_id = -1
+    while True:
+        cur.execute(
+            """
+            SELECT lyrics.track_id, lyrics_blobs.codec, lyrics_blobs.body
+            FROM lyrics
+            JOIN lyrics_blobs ON lyrics_blobs.content_hash = lyrics.content_hash
+            WHERE lyrics.track_id > ?
+            ORDER BY lyrics.track_id
+            LIMIT ?
+            """,
+            (last_id, batch_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+
+        cur.executemany(
+            INDEX_LYRICS_SQL,
+            [(track_id, decompress(codec, body)) for track_id, codec, body in rows],
+        )
+        indexed += len(rows)
+        last_id = rows[-1][0]
+
+    return indexed
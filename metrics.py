@@ -0,0 +1,214 @@
+# metrics.py
+# In-process metrics for the pipeline: counters and histograms keyed by
+# name + labels, exported at the end of a run as a JSON summary and as a
+# Prometheus textfile (for node_exporter's textfile collector).
+# Every update is one dict lookup and a few adds under a single lock, so
+# it's cheap enough to call per HTTP request / per batch.
+#
+#   metrics.inc("http_requests_total", host="api.lyrics.ovh", status=200)
+#   with metrics.timer("chart_parse_seconds", backend="lxml"):
+#       ...
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) for latency histograms; +Inf is implicit.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Whole stages take seconds to many minutes.
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+_lock = threading.Lock()
+_counters = {}       # (name, labels) -> value
+_histograms = {}     # (name, labels) -> Histogram
+_help = {}           # name -> description
+_started = time.time()
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-th observation (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+
+def _key(name, labels):
+    if not labels:
+        return name, ()
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name, text):
+    """Optional help text shown in the Prometheus export."""
+    _help[name] = text
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram(buckets)
+        hist.observe(value)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the with-block's duration (seconds) into histogram `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def reset():
+    global _started
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _started = time.time()
+
+
+# ----------------------------------------------------------
+# Export
+# ----------------------------------------------------------
+
+def _label_text(labels):
+    return ",".join(f"{k}={v}" for k, v in labels)
+
+
+def summary(**extra):
+    """Plain-dict snapshot of every metric, plus any extra run info."""
+    import datetime  # only needed at export time, kept off the import path
+
+    with _lock:
+        counters = dict(_counters)
+        histograms = {
+            key: (h.count, h.sum, h.min, h.max, h.quantile(0.5), h.quantile(0.95))
+            for key, h in _histograms.items()
+        }
+
+    result = {
+        "started_at": datetime.datetime.fromtimestamp(_started).isoformat(timespec="seconds"),
+        "duration_seconds": round(time.time() - _started, 3),
+        "counters": {},
+        "histograms": {},
+    }
+    result.update(extra)
+
+    for (name, labels), value in sorted(counters.items()):
+        result["counters"].setdefault(name, {})[_label_text(labels)] = value
+    for (name, labels), (count, total, lo, hi, p50, p95) in sorted(histograms.items()):
+        result["histograms"].setdefault(name, {})[_label_text(labels)] = {
+            "count": count,
+            "sum": round(total, 6),
+            "mean": round(total / count, 6) if count else None,
+            "min": lo,
+            "max": hi,
+            "p50_le": p50,
+            "p95_le": p95,
+        }
+    return result
+
+
+def prometheus_text():
+    """Metrics in the Prometheus text exposition format."""
+
+    def fmt_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (
+            k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for k, v in pairs
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(
+            (key, (h.buckets, list(h.counts), h.count, h.sum)) for key, h in _histograms.items()
+        )
+
+    lines = []
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{fmt_labels(labels)} {value}")
+
+    for (name, labels), (buckets, counts, count, total) in histograms:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, n in zip(buckets, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{fmt_labels(labels)} {total}")
+        lines.append(f"{name}_count{fmt_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_json(path, **extra):
+    import json
+
+    _write_atomic(path, json.dumps(summary(**extra), indent=2, default=str))
+
+
+def write_prometheus(path):
+    # Written to a temp file and renamed, so the textfile collector never
+    # reads a half-written file.
+    _write_atomic(path, prometheus_text())
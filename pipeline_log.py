@@ -0,0 +1,92 @@
+# pipeline_log.py
+# Leveled, structured logging for the pipeline modules (stdlib logging).
+# Each call is an event name plus key=value fields:
+#
+#   log = pipeline_log.get_logger("gather_lyrics")
+#   log.info("lyrics_saved", track_id=12, chars=1830)
+#
+# prints  2025-01-01T12:00:00 INFO  gather_lyrics lyrics_saved track_id=12 chars=1830
+# or, with configure(json_lines=True), one JSON object per line.
+# Fields are only formatted when the level is enabled.
+
+import json
+import logging
+import sys
+
+ROOT = "pipeline"
+
+
+class LogfmtFormatter(logging.Formatter):
+    def format(self, record):
+        fields = getattr(record, "fields", {})
+        parts = [
+            self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            f"{record.levelname:<5}",
+            record.name.split(".", 1)[-1],
+            record.getMessage(),
+        ]
+        for key, value in fields.items():
+            text = str(value)
+            if not text or any(c in text for c in ' "='):
+                text = json.dumps(text, ensure_ascii=False)
+            parts.append(f"{key}={text}")
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name.split(".", 1)[-1],
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class StructLogger:
+    """Thin wrapper: log.info(event, **fields)."""
+
+    __slots__ = ("logger",)
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def log(self, level, event, exc_info=None, **fields):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+
+def get_logger(name):
+    return StructLogger(logging.getLogger(f"{ROOT}.{name}"))
+
+
+def configure(level="INFO", json_lines=False, stream=None):
+    """Send pipeline logs to stderr (or stream). Safe to call more than once."""
+    root = logging.getLogger(ROOT)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_lines else LogfmtFormatter())
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.propagate = False
@@ -0,0 +1,48 @@
+# rate_limiter.py
+# Thread-safe token buckets, one per host, used instead of fixed sleeps.
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts up to `capacity`.
+    acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def get_bucket(host, rate, capacity=None):
+    """Return the shared bucket for a host, creating it on first use."""
+    with _lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity)
+            _buckets[host] = bucket
+        return bucket
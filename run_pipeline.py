@@ -1,12 +1,39 @@
 # run_pipeline.py
+# Each stage imports its own modules, so running one stage only pays for
+# the dependencies that stage actually uses. Stages declare what they
+# depend on and stage_scheduler runs independent ones concurrently:
+#
+#   tables -> genius -> charts
+#                    -> lyrics
+#                    -> audiodb
+#
+# Finished stages are checkpointed; after a crash, rerunning resumes with
+# the unfinished stages. Checkpoints are cleared once a run succeeds.
+#
+# --stream replaces the genius/lyrics/audiodb stages with one streaming
+# stage (stream_pipeline.py) where each new track is enriched right away.
+#
+# Logs go to stderr (pipeline_log.py); at the end of every run the metrics
+# (metrics.py) are written as a JSON summary and a Prometheus textfile.
+#
+#   python run_pipeline.py [--stream] [--only STAGE ...] [--skip STAGE ...] [--fresh]
+#                          [--log-level DEBUG] [--log-json]
 
-import sqlite3
+import sys
+import time
 
-from db_setup import create_tables, DB_NAME
-from gather_genius import track_exists, add_song_to_db, get_track_count
-from gather_charts import gather_chart_data
-from gather_lyrics import gather_lyrics
-from gather_audiodb import gather_audiodb
+import metrics
+import pipeline_log
+import stage_scheduler
+from stage_scheduler import Stage
+
+METRICS_JSON = "pipeline_metrics.json"
+METRICS_PROM = "pipeline_metrics.prom"
+
+log = pipeline_log.get_logger("run_pipeline")
+
+metrics.describe("pipeline_runs_total", "Pipeline runs, by status.")
+metrics.describe("http_connections_opened_total", "TCP connections opened per host (the rest of the requests reused one).")
 
 
 SONGS = [
@@ -111,57 +138,174 @@ SONGS = [
     ("Sabrina Carpenter", "When Did You Get Hot?"),
 ]
 
+GENIUS_BATCH_LIMIT = 25
+TARGET_TOTAL = 100
+LYRICS_WORKERS = None     # --lyrics-workers; None = gather_lyrics.LYRICS_WORKERS
 
-def run_genius_stage():
-    BATCH_LIMIT = 25
-    TARGET_TOTAL = 100
 
-    conn = sqlite3.connect(DB_NAME)
+def run_tables_stage():
+    from db_setup import create_tables
 
-    current = get_track_count(conn)
-    print("Current tracks in DB:", current)
+    create_tables()
 
-    if current >= TARGET_TOTAL:
-        print("Already reached target of", TARGET_TOTAL)
-        conn.close()
+
+def run_genius_stage():
+    import gather_genius
+    from db_writer import BatchWriter
+    from gather_genius import add_song_to_db, get_track_count
+
+    if not gather_genius.GENIUS_TOKEN:
+        log.error("genius_token_missing")
         return
 
-    cur = conn.cursor()
-    new_added = 0
+    with BatchWriter(name="genius") as writer:
+        conn = writer.conn
 
-    for artist, title in SONGS:
-        if new_added >= BATCH_LIMIT or current >= TARGET_TOTAL:
-            break
+        current = get_track_count(conn)
+        log.info("genius_stage_start", tracks=current, target=TARGET_TOTAL)
 
-        # track_exists expects (cur, artist_id, title) -- so we DON'T call it here.
-        # add_song_to_db already checks duplicates correctly.
-        if add_song_to_db(conn, artist, title):
-            new_added += 1
-            current += 1
+        if current >= TARGET_TOTAL:
+            log.info("genius_target_reached", target=TARGET_TOTAL)
+            return
 
-    conn.close()
-    print("New tracks added this run:", new_added)
-    print("Total tracks now (approx):", current)
+        new_added = 0
 
+        for artist, title in SONGS:
+            if new_added >= GENIUS_BATCH_LIMIT or current >= TARGET_TOTAL:
+                break
 
-def main():
-    print("Creating tables…")
-    create_tables()
+            # track_exists expects (cur, artist_id, title) -- so we DON'T call it here.
+            # add_song_to_db already checks duplicates correctly.
+            if add_song_to_db(conn, artist, title, writer):
+                new_added += 1
+                current += 1
 
-    print("Filling tracks via Genius…")
-    run_genius_stage()
+    log.info("genius_stage_complete", added=new_added, tracks=current)
+
+
+def run_charts_stage():
+    from gather_charts import gather_chart_data
 
-    print("Gathering chart data…")
     gather_chart_data()
 
-    print("Gathering lyrics…")
-    gather_lyrics()
 
-    print("Gathering AudioDB metadata…")
+def run_lyrics_stage():
+    from gather_lyrics import gather_lyrics
+
+    gather_lyrics(LYRICS_WORKERS)
+
+
+def run_audiodb_stage():
+    from gather_audiodb import gather_audiodb
+
     gather_audiodb()
 
-    print("Pipeline complete.")
+
+def run_stream_stage():
+    from stream_pipeline import stream_pipeline
+
+    stream_pipeline(SONGS, GENIUS_BATCH_LIMIT, TARGET_TOTAL)
+
+
+# Charts, lyrics and AudioDB only need the tracks table filled, not each other.
+STAGES = [
+    Stage("tables", "Creating tables…", run_tables_stage, ()),
+    Stage("genius", "Filling tracks via Genius…", run_genius_stage, ("tables",)),
+    Stage("charts", "Gathering chart data…", run_charts_stage, ("genius",)),
+    Stage("lyrics", "Gathering lyrics…", run_lyrics_stage, ("genius",)),
+    Stage("audiodb", "Gathering AudioDB metadata…", run_audiodb_stage, ("genius",)),
+]
+
+# --stream: Genius, lyrics and AudioDB as one per-track streaming stage.
+STREAM_STAGES = [
+    Stage("tables", "Creating tables…", run_tables_stage, ()),
+    Stage("stream", "Streaming Genius → lyrics + AudioDB…", run_stream_stage, ("tables",)),
+    Stage("charts", "Gathering chart data…", run_charts_stage, ("stream",)),
+]
+
+
+def main(only=None, skip=None, workers=None, fresh=False, stream=False):
+    try:
+        stages = stage_scheduler.select_stages(STREAM_STAGES if stream else STAGES, only, skip)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    names = [stage.name for stage in stages]
+
+    if fresh:
+        stage_scheduler.clear_checkpoints(names)
+    completed = stage_scheduler.load_checkpoints() & set(names)
+    if completed:
+        log.info("resuming", checkpointed=",".join(sorted(completed)))
+
+    start = time.perf_counter()
+    results = stage_scheduler.run_stages(
+        stages,
+        workers=workers,
+        completed=completed,
+        on_complete=stage_scheduler.save_checkpoint,
+    )
+    elapsed = time.perf_counter() - start
+
+    failed = [name for name in names if results[name][0] in ("failed", "blocked")]
+    stage_time = sum(seconds for _, seconds in results.values())
+    if failed:
+        log.error("pipeline_stopped", unfinished=",".join(failed))
+    else:
+        stage_scheduler.clear_checkpoints(names)
+        log.info("pipeline_complete", seconds=round(elapsed, 1), stage_seconds=round(stage_time, 1))
+
+    # Imported here: the stages that use the network have loaded them already.
+    import http_cache
+    import http_client
+
+    connections = http_client.connection_stats()
+    for host, stats in connections.items():
+        metrics.inc("http_connections_opened_total", stats["connections"], host=host)
+        log.info("http_connections", host=host, **stats)
+
+    cache = http_cache.stats()
+    log.info("http_cache", hits=cache["hits"], misses=cache["misses"],
+             hit_rate=round(cache["hit_rate"], 3), revalidated=cache["revalidated"])
+
+    write_metrics(results, elapsed, connections, cache)
+    return 1 if failed else 0
+
+
+def write_metrics(results, elapsed, connections, cache):
+    failed = any(status in ("failed", "blocked") for status, _ in results.values())
+    metrics.inc("pipeline_runs_total", status="failed" if failed else "ok")
+    metrics.write_json(
+        METRICS_JSON,
+        pipeline_seconds=round(elapsed, 3),
+        stages={name: {"status": status, "seconds": round(seconds, 3)}
+                for name, (status, seconds) in results.items()},
+        http_connections=connections,
+        http_cache=cache,
+    )
+    metrics.write_prometheus(METRICS_PROM)
+    log.info("metrics_written", json=METRICS_JSON, prometheus=METRICS_PROM)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the data-gathering pipeline.")
+    parser.add_argument("--only", nargs="+", metavar="STAGE", help="run just these stages")
+    parser.add_argument("--skip", nargs="+", metavar="STAGE", help="leave these stages out")
+    parser.add_argument("--workers", type=int, default=None, help="stages run at the same time")
+    parser.add_argument("--fresh", action="store_true", help="ignore checkpoints from an earlier run")
+    parser.add_argument("--stream", action="store_true",
+                        help="enrich each new track as soon as Genius adds it")
+    parser.add_argument("--lyrics-workers", type=int, default=None,
+                        help="lyrics fetched at the same time (lyrics stage)")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--log-json", action="store_true", help="one JSON object per log line")
+    parser.add_argument("--metrics-json", default=METRICS_JSON)
+    parser.add_argument("--metrics-prom", default=METRICS_PROM)
+    args = parser.parse_args()
+
+    pipeline_log.configure(args.log_level, json_lines=args.log_json)
+    METRICS_JSON, METRICS_PROM = args.metrics_json, args.metrics_prom
+    LYRICS_WORKERS = args.lyrics_workers
+
+    sys.exit(main(args.only, args.skip, args.workers, args.fresh, args.stream))
\ No newline at end of file
@@ -0,0 +1,160 @@
+# stage_scheduler.py
+# Small dependency-aware stage runner used by run_pipeline.
+# Each stage names the stages it depends on; a stage starts as soon as all
+# of its (selected) dependencies have finished, so independent stages run
+# at the same time in a thread pool. Finished stages are checkpointed in
+# the pipeline_checkpoints table, so a rerun after a crash skips them and
+# resumes with the first unfinished ones.
+
+import datetime
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+import pipeline_log
+
+Stage = namedtuple("Stage", "name message run deps")
+
+log = pipeline_log.get_logger("stage_scheduler")
+
+metrics.describe("stage_runs_total", "Pipeline stage runs, by stage and status.")
+metrics.describe("stage_seconds", "Wall time of each pipeline stage.")
+
+
+def select_stages(stages, only=None, skip=None):
+    """Stages to run, in declared order. Unknown names raise ValueError."""
+    names = [stage.name for stage in stages]
+    unknown = (set(only or ()) | set(skip or ())) - set(names)
+    if unknown:
+        raise ValueError(
+            f"Unknown stage(s): {', '.join(sorted(unknown))}; choose from {', '.join(names)}"
+        )
+    return [
+        stage for stage in stages
+        if (not only or stage.name in only) and stage.name not in (skip or ())
+    ]
+
+
+def check_acyclic(stages):
+    """Raise ValueError if the dependencies among the stages form a cycle."""
+    deps = {stage.name: list(stage.deps) for stage in stages}
+    visiting, done = set(), set()
+
+    def visit(name, path):
+        if name in done or name not in deps:
+            return
+        if name in visiting:
+            raise ValueError("Stage dependency cycle: " + " -> ".join(path + [name]))
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for name in deps:
+        visit(name, [])
+
+
+# ----------------------------------------------------------
+# Checkpoints (db_setup is imported here, not at the top, to keep
+# run_pipeline's startup cheap)
+# ----------------------------------------------------------
+
+def load_checkpoints():
+    from db_setup import create_checkpoint_table, get_connection
+
+    conn = get_connection()
+    create_checkpoint_table(conn.cursor())
+    conn.commit()
+    done = {row[0] for row in conn.execute("SELECT stage FROM pipeline_checkpoints")}
+    conn.close()
+    return done
+
+
+def save_checkpoint(name):
+    from db_setup import get_connection
+
+    conn = get_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO pipeline_checkpoints (stage, completed_at) VALUES (?, ?)",
+        (name, datetime.datetime.now().isoformat(timespec="seconds")),
+    )
+    conn.commit()
+    conn.close()
+
+
+def clear_checkpoints(names):
+    from db_setup import create_checkpoint_table, get_connection
+
+    conn = get_connection()
+    create_checkpoint_table(conn.cursor())
+    conn.executemany("DELETE FROM pipeline_checkpoints WHERE stage = ?", [(n,) for n in names])
+    conn.commit()
+    conn.close()
+
+
+# ----------------------------------------------------------
+# Runner
+# ----------------------------------------------------------
+
+def run_stages(stages, workers=None, completed=(), on_complete=None):
+    """
+    Run stages respecting their deps. Dependencies that aren't in `stages`
+    are treated as already satisfied; names in `completed` are skipped.
+    A failed stage blocks everything that depends on it, while unrelated
+    stages keep running.
+    Returns {stage name: (status, seconds)} with status one of
+    "done", "checkpoint", "failed" or "blocked".
+    """
+    check_acyclic(stages)
+    selected = {stage.name for stage in stages}
+    results = {name: ("checkpoint", 0.0) for name in selected & set(completed)}
+    pending = [stage for stage in stages if stage.name not in results]
+    finished = set(results)
+
+    def deps_of(stage):
+        return [dep for dep in stage.deps if dep in selected]
+
+    def timed(stage):
+        start = time.perf_counter()
+        stage.run()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers or max(len(pending), 1)) as pool:
+        running = {}
+        while pending or running:
+            for stage in list(pending):
+                deps = deps_of(stage)
+                if any(results.get(dep, ("",))[0] in ("failed", "blocked") for dep in deps):
+                    pending.remove(stage)
+                    results[stage.name] = ("blocked", 0.0)
+                    log.warning("stage_blocked", stage=stage.name)
+                elif all(dep in finished for dep in deps):
+                    pending.remove(stage)
+                    log.info("stage_start", stage=stage.name, message=stage.message)
+                    running[pool.submit(timed, stage)] = stage
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    results[stage.name] = ("failed", 0.0)
+                    metrics.inc("stage_runs_total", stage=stage.name, status="failed")
+                    log.error("stage_failed", stage=stage.name, error=repr(e))
+                    continue
+                results[stage.name] = ("done", seconds)
+                finished.add(stage.name)
+                metrics.inc("stage_runs_total", stage=stage.name, status="done")
+                metrics.observe("stage_seconds", seconds,
+                                buckets=metrics.STAGE_BUCKETS, stage=stage.name)
+                log.info("stage_done", stage=stage.name, seconds=round(seconds, 2))
+                if on_complete:
+                    on_complete(stage.name)
+
+    return results
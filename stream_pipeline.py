@@ -0,0 +1,187 @@
+# stream_pipeline.py
+# Streaming mode for run_pipeline (--stream): instead of finishing every
+# Genius insert before lyrics and AudioDB start, each new track id is
+# pushed straight into bounded asyncio queues that feed lyrics and
+# AudioDB workers. Full queues make the Genius producer wait
+# (backpressure), and network waits for all three APIs overlap. Tracks
+# left over from earlier runs are fed in alongside, at a lower priority,
+# so a large backlog never delays the first new track.
+#
+# The API wrappers are blocking, so their calls run in a thread pool; the
+# per-host token buckets still apply. All database work happens on one
+# dedicated thread that owns the BatchWriter, so track inserts and the
+# lyrics/AudioDB rows that reference them share a connection. No network
+# call ever runs on that thread.
+
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gather_audiodb
+import gather_genius
+import gather_lyrics
+import metrics
+import pipeline_log
+from db_writer import BatchWriter
+from gather_genius import get_track_count
+
+QUEUE_SIZE = 16           # tracks waiting per queue before Genius pauses
+LYRICS_WORKERS = 4
+AUDIODB_WORKERS = 4
+NETWORK_THREADS = 16      # blocking API calls in flight at once
+
+# Queue priorities: new Genius tracks jump ahead of the backlog, and the
+# workers' stop signal comes after both.
+NEW, BACKLOG, DONE = 0, 1, 2
+
+log = pipeline_log.get_logger("stream_pipeline")
+
+metrics.describe("stream_first_enriched_seconds", "Time until the first track had both lyrics and AudioDB data.")
+
+
+class StreamStats:
+    """Counts and the time the first track had both lyrics and AudioDB done."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.added = 0
+        self.lyrics = 0
+        self.audiodb = 0
+        self.pending = {}          # track_id -> sources still to finish
+        self.first_enriched = None
+
+    def queued(self, track_id):
+        self.pending[track_id] = {"lyrics", "audiodb"}
+
+    def finished(self, track_id, source):
+        setattr(self, source, getattr(self, source) + 1)
+        waiting = self.pending.get(track_id)
+        if waiting is None:
+            return
+        waiting.discard(source)
+        if not waiting:
+            del self.pending[track_id]
+            if self.first_enriched is None:
+                self.first_enriched = time.perf_counter() - self.start
+                metrics.observe("stream_first_enriched_seconds", self.first_enriched)
+
+
+async def run_stream(songs, batch_limit=25, target_total=100):
+    loop = asyncio.get_running_loop()
+    stats = StreamStats()
+    lyrics_queue = asyncio.PriorityQueue(maxsize=QUEUE_SIZE)
+    audiodb_queue = asyncio.PriorityQueue(maxsize=QUEUE_SIZE)
+    order = itertools.count()      # first in, first out within a priority
+
+    db_thread = ThreadPoolExecutor(max_workers=1)
+    network = ThreadPoolExecutor(max_workers=NETWORK_THREADS)
+    audiodb_requests = ThreadPoolExecutor(max_workers=gather_audiodb.AUDIODB_MAX_IN_FLIGHT)
+
+    def on_db(func, *args):
+        return loop.run_in_executor(db_thread, func, *args)
+
+    def on_network(func, *args):
+        return loop.run_in_executor(network, func, *args)
+
+    writer = await on_db(lambda: BatchWriter(name="stream"))
+
+    async def put(queue, priority, item):
+        await queue.put((priority, next(order), item))
+
+    async def feed_backlog(queue, get_rows):
+        """Tracks left unfinished by an earlier run (one scan, at start)."""
+        for row in await on_db(get_rows):
+            if row[0] not in stats.pending:
+                await put(queue, BACKLOG, row)
+
+    async def produce():
+        """Genius inserts; every new track id goes straight to both queues."""
+        if not gather_genius.GENIUS_TOKEN:
+            log.error("genius_token_missing")
+            return
+
+        current = await on_db(get_track_count, writer.conn)
+        for artist, title in songs:
+            if stats.added >= batch_limit or current >= target_total:
+                break
+            try:
+                # add_song_to_db in three steps, so the Genius request waits
+                # in the network pool instead of holding up the DB thread.
+                if not await on_db(gather_genius.needs_search, writer.conn, artist, title):
+                    continue
+                result = await on_network(gather_genius.search_genius, artist, title)
+                track_id = await on_db(gather_genius.store_search_result,
+                                       writer.conn, artist, title, result, writer)
+            except Exception as e:
+                log.error("genius_failed", artist=artist, title=title, error=repr(e))
+                continue
+            if track_id is None:
+                continue
+            stats.added += 1
+            current += 1
+            stats.queued(track_id)
+            await put(lyrics_queue, NEW, (track_id, artist, title))
+            await put(audiodb_queue, NEW, (track_id, title))
+
+    async def lyrics_worker():
+        while True:
+            _, _, item = await lyrics_queue.get()
+            if item is None:
+                return
+            track_id, artist, title = item
+            try:
+                lyrics, error = await on_network(gather_lyrics.lookup_lyrics, artist, title)
+                await on_db(gather_lyrics.record_result, track_id, lyrics, writer, error)
+            except Exception as e:
+                log.error("lyrics_failed", track_id=track_id, error=repr(e))
+            stats.finished(track_id, "lyrics")
+
+    async def audiodb_worker():
+        while True:
+            _, _, item = await audiodb_queue.get()
+            if item is None:
+                return
+            track_id, title = item
+            try:
+                info = await on_network(gather_audiodb.lookup_track, title, audiodb_requests)
+                await on_db(gather_audiodb.record_result, track_id, title, info, writer)
+            except Exception as e:
+                log.error("audiodb_failed", track_id=track_id, error=repr(e))
+            stats.finished(track_id, "audiodb")
+
+    workers = (
+        [asyncio.create_task(lyrics_worker()) for _ in range(LYRICS_WORKERS)]
+        + [asyncio.create_task(audiodb_worker()) for _ in range(AUDIODB_WORKERS)]
+    )
+
+    backlog = [
+        asyncio.create_task(feed_backlog(lyrics_queue, gather_lyrics.get_tracks_missing_lyrics)),
+        asyncio.create_task(feed_backlog(audiodb_queue, gather_audiodb.get_tracks_missing_audiodb)),
+    ]
+
+    try:
+        await produce()
+        await asyncio.gather(*backlog)
+    finally:
+        for task in backlog:
+            task.cancel()          # only still running if produce() failed
+        await asyncio.gather(*backlog, return_exceptions=True)
+        for _ in range(LYRICS_WORKERS):
+            await put(lyrics_queue, DONE, None)
+        for _ in range(AUDIODB_WORKERS):
+            await put(audiodb_queue, DONE, None)
+        await asyncio.gather(*workers)
+        await on_db(writer.close)
+        for pool in (audiodb_requests, network, db_thread):
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - stats.start
+    first = round(stats.first_enriched, 2) if stats.first_enriched is not None else None
+    log.info("stream_done", seconds=round(elapsed, 2), added=stats.added,
+             lyrics=stats.lyrics, audiodb=stats.audiodb, first_enriched_seconds=first)
+    return stats
+
+
+def stream_pipeline(songs, batch_limit=25, target_total=100):
+    return asyncio.run(run_stream(songs, batch_limit, target_total))
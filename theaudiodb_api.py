@@ -1,8 +1,17 @@
 # theaudiodb_api.py
-import requests
+from urllib.parse import urlsplit
+
+import http_client
+import pipeline_log
+import rate_limiter
 
 BASE_URL = "https://theaudiodb.com/api/v1/json/2"
 
+AUDIODB_RATE = 2          # requests per second (free shared API key)
+AUDIODB_BURST = 4
+
+log = pipeline_log.get_logger("theaudiodb_api")
+
 def get_track_details(track_name):
     """
     Safely fetch track data from TheAudioDB.
@@ -10,32 +19,35 @@ def get_track_details(track_name):
     Never crashes on bad responses.
     """
 
+    import requests
+
     url = f"{BASE_URL}/searchtrack.php"
     params = {"t": track_name}
 
+    bucket = rate_limiter.get_bucket(urlsplit(url).netloc, AUDIODB_RATE, AUDIODB_BURST)
+
     try:
-        resp = requests.get(url, params=params, timeout=8)
+        resp = http_client.get(url, params=params, timeout=8, bucket=bucket)
     except requests.exceptions.RequestException as e:
-        print(f" AudioDB request error for '{track_name}': {e}")
+        log.error("audiodb_request_failed", title=track_name, error=repr(e))
         return None
 
     # Handle non-200 status codes cleanly
     if resp.status_code != 200:
-        print(f" AudioDB HTTP {resp.status_code} for '{track_name}'")
+        log.warning("audiodb_http_error", title=track_name, status=resp.status_code)
         return None
 
     # Try parsing JSON safely
     try:
         data = resp.json()
     except Exception:
-        print(f" AudioDB returned non-JSON for '{track_name}'")
-        print("      Raw response preview:", resp.text[:200])
+        log.warning("audiodb_non_json", title=track_name, preview=resp.text[:200])
         return None
 
     # Expected format: {"track": [ {...} ] }
     tracks = data.get("track")
     if not tracks:
-        print(f" AudioDB returned no results for '{track_name}'")
+        log.debug("audiodb_no_results", title=track_name)
         return None
 
     return tracks[0]  # First match is usually best
@@ -0,0 +1,92 @@
+# track_matcher.py
+# In-memory index of every track keyed by a normalized (artist, title) pair.
+# Loads the catalog once so a whole chart page (or years of chart pages)
+# can be matched with dictionary lookups instead of two SQL queries per row.
+#
+# Billboard glues credits together ("Chris BrownFeaturingBryson Tiller",
+# "Shaboozey&Jelly Roll"), so both the chart credit and the stored artist
+# name are split into individual artists and every one of them is indexed.
+
+import re
+import unicodedata
+
+# Separators between credited artists. "Featuring" is matched even without
+# spaces around it because that's how the chart page renders it.
+CREDIT_SPLIT = re.compile(
+    r"\s*(?:featuring|\bfeat\.?(?=\s)|\bft\.?(?=\s)|&|,|\s+x\s+|\s+with\s+)\s*",
+    flags=re.IGNORECASE,
+)
+NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_key(text):
+    """Lowercase, strip accents and punctuation: 'Michael Bublé' -> 'michael buble'."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.casefold().replace("&", " and ")
+    return NON_WORD.sub(" ", text).strip()
+
+
+def split_credits(artist):
+    """'Riley GreenFeaturing Ella Langley' -> ['Riley Green', 'Ella Langley']."""
+    parts = [p.strip() for p in CREDIT_SPLIT.split(artist)]
+    return [p for p in parts if p]
+
+
+def catalog_rows(conn):
+    """Stream (track_id, artist name, title) for every track."""
+    cur = conn.execute("""
+        SELECT tracks.id, artists.name, tracks.title
+        FROM tracks
+        JOIN artists ON artists.id = tracks.artist_id
+    """)
+    while True:
+        rows = cur.fetchmany(10000)
+        if not rows:
+            break
+        yield from rows
+
+
+def artist_keys(artist):
+    """Full credit first, then each individual artist, without duplicates."""
+    keys = []
+    for name in [artist] + split_credits(artist):
+        key = normalize_key(name)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+class TrackIndex:
+    """
+    {(artist key, title key): track_id}
+    Full stored artist names win over the individual names split out of
+    them when two tracks would share a key.
+    """
+
+    def __init__(self, rows=()):
+        self.keys = {}
+        self.track_count = 0
+        for track_id, artist, title in rows:
+            self.add(track_id, artist, title)
+
+    def add(self, track_id, artist, title):
+        title_key = normalize_key(title)
+        if not title_key:
+            return
+
+        full_key, *part_keys = artist_keys(artist) or [""]
+        self.keys[(full_key, title_key)] = track_id
+        for key in part_keys:
+            self.keys.setdefault((key, title_key), track_id)
+        self.track_count += 1
+
+    def match(self, artist, title):
+        """Return the track_id for a chart credit, or None."""
+        title_key = normalize_key(title)
+        for key in artist_keys(artist):
+            track_id = self.keys.get((key, title_key))
+            if track_id is not None:
+                return track_id
+        return None
+